@@ -2,9 +2,10 @@ import logging
 
 from flask import jsonify, request
 
-from middlewares import auth
-from services import freight
-from utils import secret
+from middlewares import auth, profiling, tracing
+from services import admission, freight, singleflight, solverpool
+from solvers import palletcatalog
+from utils import connection, secret
 from . import api_blueprint
 
 logger = logging.getLogger(__name__)
@@ -15,13 +16,35 @@ def hello():
 
 
 @api_blueprint.route('/freight/pack', methods=['POST'])
+@tracing.traced_request
+@profiling.profiled
 @auth.auth
 def pack():
     items = request.get_json()
-    pallets = freight.pack(items)
+    environ = request.environ
+    body, status, headers = pack_response(items, request.headers.get('X-Pallet-Catalog'),
+                                          cancelled=lambda: connection.client_disconnected(environ))
+    return jsonify(body), status, headers
 
-    logger.debug('packing pallets: %s', pallets)
-    return jsonify({'status_code': 0, 'message': 'succeeded', 'data': pallets})
+
+# Pack an order and build the response of the pack endpoint, shared by the WSGI and ASGI apps
+def pack_response(items, catalog_name=None, cancelled=None):
+    try:
+        catalog = palletcatalog.get_catalog(catalog_name)
+        report = {}
+        pallets = freight.pack(items, catalog, report, cancelled=cancelled)
+    except ValueError as e:
+        return {'status_code': 1, 'message': str(e)}, 400, {}
+    except solverpool.SolverCancelled:
+        logger.info('Client disconnected, packing cancelled')
+        return {'status_code': 1, 'message': 'cancelled'}, 499, {}
+    except singleflight.SingleflightTimeout as e:
+        return {'status_code': 1, 'message': str(e)}, 504, {}
+    except admission.Overloaded as e:
+        return {'status_code': 1, 'message': 'overloaded'}, 429, {'Retry-After': str(e.retry_after)}
+
+    logger.debug('packing pallets: %d pallets %s', len(pallets), pallets)
+    return {'status_code': 0, 'message': 'succeeded', 'data': pallets, 'meta': report}, 200, {}
 
 
 # Refresh token endpoint
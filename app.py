@@ -3,6 +3,7 @@ import os
 from flask import Flask, request, jsonify
 from api.routes import api_blueprint
 from flask_cors import CORS
+from utils import logs
 
 app = Flask(__name__)
 CORS(app)
@@ -22,8 +23,13 @@ def setup_logging():
     elif log_level_str == 'ERROR':
         log_level = logging.ERROR
 
-    # Set up logging
-    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+    # Set up logging: queued writes, capped messages and sampled debug logs. Lambda freezes the process between
+    # invocations, which would hold back the records still queued, so writes are synchronous there by default.
+    on_lambda = bool(os.getenv('AWS_LAMBDA_FUNCTION_NAME'))
+    logs.configure(log_level,
+                   max_chars=int(os.getenv('LOG_MAX_CHARS', '2000')),
+                   sample_rates=logs.parse_sample_rates(os.getenv('LOG_SAMPLE_RATES')),
+                   asynchronous=os.getenv('LOG_ASYNC', 'false' if on_lambda else 'true').lower() != 'false')
 
 
 setup_logging()
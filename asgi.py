@@ -0,0 +1,156 @@
+"""
+ASGI entry point, e.g. `uvicorn asgi:app`.
+
+`POST /api/freight/pack` is served natively: the Cognito key fetch is non-blocking, Secrets Manager is called from a
+thread, and packing runs on a bounded thread pool (and in the solver pool if it is enabled), so a worker keeps serving
+other requests while a request waits. Every other route, and profiled pack requests, are served by the Flask app.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+
+from api.routes import pack_response
+from app import app as flask_app
+from middlewares import auth
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+PACK_PATH = '/api/freight/pack'
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+# Packing is CPU-bound, so it runs on its own threads, as many at a time as `ASGI_PACK_THREADS` (default 4)
+executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASGI_PACK_THREADS', '4')), thread_name_prefix='pack')
+
+_http_client = None
+
+
+def get_http_client():
+    """
+    Get the HTTP client shared by the requests of this worker, creating it on first use.
+    :return:
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=float(os.getenv('ASGI_HTTP_TIMEOUT', '10')))
+    return _http_client
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['path'] == PACK_PATH and scope['method'] == 'POST':
+        headers = httpx.Headers(scope['headers'])
+        query = scope.get('query_string', b'').decode('latin-1')
+        profiled = headers.get('X-Profile') or any(p.split('=')[0] == 'profile' for p in query.split('&'))
+        if not profiled:
+            return await pack(scope, receive, send, headers)
+
+    return await wsgi_app(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_http_client()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _http_client is not None:
+                await _http_client.aclose()
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def pack(scope, receive, send, headers):
+    """
+    Serve the pack endpoint with the same authentication, tracing and responses as the Flask route.
+    """
+    trace_id, parent_id = tracing.parse_trace_headers(headers)
+    with tracing.span(f'POST {PACK_PATH}', trace_id=trace_id, parent_id=parent_id) as span:
+        try:
+            status, body, extra_headers = await handle_pack(receive, headers)
+        except Exception as e:
+            logger.exception('Failed to pack: %s', e)
+            status, body, extra_headers = 500, 'Internal Server Error', {}
+        if span is not None:
+            span.set_attribute('http.status_code', status)
+
+    if span is not None:
+        extra_headers['X-Trace-Id'] = span.trace_id
+    await respond(send, status, body, extra_headers)
+
+
+async def handle_pack(receive, headers):
+    payload, expired_token = await auth.authenticate_async(headers.get('Authorization'), get_http_client())
+    if not payload:
+        return 401, {'message': 'Token expired' if expired_token else 'Unauthorized'}, {}
+
+    body = await read_body(receive)
+    if body is None:
+        return 499, {'status_code': 1, 'message': 'cancelled'}, {}
+    if headers.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+        return 415, 'Unsupported Media Type', {}
+    try:
+        items = json.loads(body)
+    except ValueError:
+        return 400, 'Bad Request', {}
+
+    disconnected = asyncio.Event()
+    watcher = asyncio.create_task(watch_disconnect(receive, disconnected))
+    try:
+        # The pack runs in a copy of the request context, so that its spans join the request trace
+        context = contextvars.copy_context()
+        body, status, extra_headers = await asyncio.get_running_loop().run_in_executor(
+            executor, context.run, pack_response, items, headers.get('X-Pallet-Catalog'), disconnected.is_set)
+    finally:
+        watcher.cancel()
+
+    return status, body, dict(extra_headers)
+
+
+async def read_body(receive):
+    """
+    Read the request body.
+    :return: The body, or None if the client disconnected.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def watch_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+
+async def respond(send, status, body, extra_headers):
+    if isinstance(body, str):
+        content, content_type = body.encode(), b'text/html; charset=utf-8'
+    else:
+        content, content_type = json.dumps(body).encode(), b'application/json'
+
+    headers = [(b'content-type', content_type),
+               (b'content-length', str(len(content)).encode()),
+               (b'access-control-allow-origin', b'*')]
+    headers += [(k.lower().encode('latin-1'), str(v).encode('latin-1')) for k, v in extra_headers.items()]
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
@@ -0,0 +1,182 @@
+"""
+Load test the pack endpoint of gunicorn servers with a mix of orders, offline.
+
+Each gunicorn configuration (workers x threads) is started in turn with local stand-ins for the Cognito key endpoint
+and for Secrets Manager, and is sent `--requests` pack requests at every concurrency level. The orders are drawn from
+the classes of `--mix` by weight. Throughput counts the successful requests; latency percentiles are over the
+successful requests; the error rate is the share of requests that did not get a 200.
+
+Usage:
+    python -m benchmarks.loadtest --configs 1x4 2x2 4x1 --concurrency 4 16 --requests 200 \\
+        --mix tiny=60 small=30 large=10 --env SOLVER_POOL_WORKERS=2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks import stubs
+from benchmarks.serving import free_port, percentile, start_process
+from benchmarks.solvers import random_order
+
+# Units per order of each order class
+ORDER_CLASSES = {
+    'tiny': 2,
+    'small': 12,
+    'medium': 40,
+    'large': 300,
+    'huge': 8000,
+}
+
+
+def parse_config(value):
+    """
+    Parses a gunicorn configuration given as WORKERSxTHREADS, e.g. 2x4.
+    """
+    try:
+        workers, threads = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not WORKERSxTHREADS')
+    return workers, threads
+
+
+def parse_weight(value):
+    """
+    Parses an order class and its weight in the mix, e.g. small=30.
+    """
+    name, _, weight = value.partition('=')
+    if name not in ORDER_CLASSES:
+        raise argparse.ArgumentTypeError(f'unknown order class {name}, choose from {", ".join(ORDER_CLASSES)}')
+    try:
+        return name, float(weight or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not CLASS=WEIGHT')
+
+
+def parse_env(value):
+    name, sep, setting = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'{value} is not NAME=VALUE')
+    return name, setting
+
+
+def create_orders(mix, variants, seed):
+    """
+    Returns `variants` random orders of every order class of the mix.
+    """
+    rng = random.Random(seed)
+    return {name: [random_order(ORDER_CLASSES[name], rng) for _ in range(variants)] for name, _ in mix}
+
+
+def gunicorn_command(port, workers, threads, timeout):
+    return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+            '--timeout', str(timeout), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+
+
+async def drive(url, token, concurrency, requests, mix, orders, seed):
+    """
+    Send `requests` pack requests, `concurrency` at a time, drawing their orders from the mix.
+    :return: The latencies of the successful requests by order class, the status of every request by order class
+    ('error' if the request failed without a response), and the elapsed time.
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    picks = rng.choices(names, weights=[weight for _, weight in mix], k=requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {name: [] for name in names}
+    statuses = {name: Counter() for name in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        async def one(name):
+            order = rng.choice(orders[name])
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/api/freight/pack', json=order,
+                                                 headers={'Authorization': f'Bearer {token}'})
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 'error'
+                if status == 200:
+                    latencies[name].append(time.perf_counter() - started)
+                statuses[name][status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(name) for name in picks))
+        return latencies, statuses, time.perf_counter() - started
+
+
+def report_row(label, concurrency, latencies, statuses, elapsed):
+    total = sum(statuses.values())
+    errors = total - statuses[200]
+    failures = ' '.join(f'{status}:{count}' for status, count in sorted(statuses.items(), key=str) if status != 200)
+    return (f'{label:>8} {concurrency:>11} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 50) * 1000:>8.1f} '
+            f'{percentile(latencies, 90) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} '
+            f'{100 * errors / max(total, 1):>7.1f} {failures}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', type=parse_config, nargs='+', default=[(1, 4), (2, 2), (4, 1)],
+                        help='gunicorn workers and threads, as WORKERSxTHREADS')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--mix', type=parse_weight, nargs='+', default=[('tiny', 60), ('small', 30), ('large', 10)],
+                        help=f'Order classes and their weights, as CLASS=WEIGHT; classes: {", ".join(ORDER_CLASSES)}')
+    parser.add_argument('--variants', type=int, default=20, help='Distinct orders per order class')
+    parser.add_argument('--by-class', action='store_true', help='Also report every order class')
+    parser.add_argument('--credentials', choices=['secrets-manager', 'env'], default='secrets-manager',
+                        help='Read the credentials from the Secrets Manager stub or from environment variables')
+    parser.add_argument('--jwks-latency', type=float, default=0.05, help='Latency of the key fetch in seconds')
+    parser.add_argument('--secrets-latency', type=float, default=0.02, help='Latency of Secrets Manager in seconds')
+    parser.add_argument('--timeout', type=int, default=120, help='gunicorn worker timeout in seconds')
+    parser.add_argument('--env', type=parse_env, action='append', default=[],
+                        help='Environment variable of the servers, as NAME=VALUE, e.g. SOLVER_POOL_WORKERS=2')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    orders = create_orders(args.mix, args.variants, args.seed)
+    issuer = stubs.TokenIssuer()
+    token = issuer.issue(ttl=24 * 3600)
+    jwks = stubs.jwks_server(issuer, latency=args.jwks_latency).start()
+    secrets_manager = stubs.secrets_manager_server(issuer, latency=args.secrets_latency).start()
+
+    env = {**os.environ, 'COGNITO_IDP_ENDPOINT': jwks.url, 'LOG_LEVEL': 'WARNING'}
+    if args.credentials == 'secrets-manager':
+        env.update(stubs.stored_credentials(secrets_manager))
+    else:
+        env.update(stubs.local_credentials(issuer))
+    env.update(args.env)
+
+    print(f'{"config":>8} {"concurrency":>11} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"errors%":>7} '
+          f'failures')
+    try:
+        for workers, threads in args.configs:
+            port = free_port()
+            config = f'{workers}x{threads}'
+            process, url = start_process(gunicorn_command(port, workers, threads, args.timeout), env, port, config)
+            try:
+                for concurrency in args.concurrency:
+                    latencies, statuses, elapsed = asyncio.run(
+                        drive(url, token, concurrency, args.requests, args.mix, orders, args.seed))
+                    print(report_row(config, concurrency, [t for values in latencies.values() for t in values],
+                                     sum(statuses.values(), Counter()), elapsed), flush=True)
+                    if args.by_class:
+                        for name in latencies:
+                            print(report_row(name, concurrency, latencies[name], statuses[name], elapsed), flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        jwks.stop()
+        secrets_manager.stop()
+
+
+if __name__ == '__main__':
+    main()
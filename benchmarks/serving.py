@@ -0,0 +1,137 @@
+"""
+Compare how many concurrent pack requests one WSGI (gunicorn) and one ASGI (uvicorn) worker process sustain while
+every request waits on the Cognito key fetch.
+
+Usage:
+    python -m benchmarks.serving --concurrency 1 8 32 --requests 200 --jwks-latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks import stubs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ORDER = [
+    {'sku': 'SKU0001', 'weight': 20, 'length': 30, 'width': 20, 'height': 10, 'assembled': False, 'bundled': False,
+     'quantity': 2},
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port, threads):
+    if server == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', '--workers', '1', '--threads', str(threads),
+                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', '1', '--port', str(port),
+            '--log-level', 'warning']
+
+
+def start_server(server, env, threads):
+    """
+    Start a server process and wait until it answers.
+    :return: The process and its base URL.
+    """
+    port = free_port()
+    return start_process(server_command(server, port, threads), env, port, server)
+
+
+def start_process(command, env, port, name):
+    """
+    Start a server process listening on `port` and wait until it answers.
+    :return: The process and its base URL.
+    """
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'{url}/health', timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{name} server did not start')
+
+
+async def drive(url, token, concurrency, requests, order=ORDER):
+    """
+    Send `requests` pack requests, `concurrency` at a time.
+    :return: The latencies of the successful requests, the number of errors and the elapsed time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/api/freight/pack', json=order,
+                                                 headers={'Authorization': f'Bearer {token}'})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1, help='Threads of the gunicorn worker')
+    parser.add_argument('--jwks-latency', type=float, default=0.1, help='Latency of the key fetch in seconds')
+    args = parser.parse_args()
+
+    issuer = stubs.TokenIssuer()
+    jwks = stubs.jwks_server(issuer, latency=args.jwks_latency).start()
+    env = {**os.environ, **stubs.local_credentials(issuer), 'COGNITO_IDP_ENDPOINT': jwks.url,
+           'LOG_LEVEL': 'WARNING'}
+    token = issuer.issue()
+
+    print(f'{"server":>6} {"concurrency":>11} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    try:
+        for server in args.servers:
+            process, url = start_server(server, env, args.threads)
+            try:
+                for concurrency in args.concurrency:
+                    latencies, errors, elapsed = asyncio.run(drive(url, token, concurrency, args.requests))
+                    print(f'{server:>6} {concurrency:>11} {len(latencies) / elapsed:>8.1f} '
+                          f'{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} '
+                          f'{errors:>6}', flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        jwks.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark the solver engines on random orders.
+
+Usage:
+    python -m benchmarks.solvers --units 30 50 70 150 --orders 3 --time-limit 10 [--warm-start]
+"""
+import argparse
+import random
+import time
+
+from solvers import bounds
+from solvers.itemtable import ItemTable
+from solvers.palletcatalog import DEFAULT_CATALOG
+from services import freight, solverpool
+
+
+def random_order(units, rng, lines=None):
+    """
+    Returns a random order of about `units` units, in the record format of the pack endpoint.
+    """
+    lines = lines or max(1, units // 5)
+    order = []
+    for i in range(lines):
+        bundled = rng.random() < 0.1
+        assembled = not bundled and rng.random() < 0.2
+        order.append({
+            'sku': f'SKU{i:04d}',
+            'weight': round(rng.uniform(5, 60), 1),
+            'length': round(rng.uniform(40, 95) if bundled else rng.uniform(10, 95), 1),
+            'width': round(rng.uniform(2, 9) if bundled else rng.uniform(10, 40), 1),
+            'height': round(rng.uniform(1, 5) if bundled else rng.uniform(5, 30), 1),
+            'assembled': assembled,
+            'bundled': bundled,
+            'quantity': 1,
+        })
+    for _ in range(units - lines):
+        rng.choice(order)['quantity'] += 1
+    return order
+
+
+def run(engine, items, pallets, time_limit, warm_start=False):
+    """
+    Solves an order with an engine, with the first-fit decreasing packing as its warm start if `warm_start` is set.
+    :return: The objective value (None if no solution was found), the number of pallets and the time taken.
+    """
+    started = time.perf_counter()
+    packing = bounds.heuristic_solution(items, pallets)[1] if warm_start else None
+    results = solverpool.SOLVERS[engine](items, pallets, time_limit=time_limit * 1000, warm_start=packing).solve()
+    elapsed = time.perf_counter() - started
+    cost = sum(1 + result['size'] / 1000.0 for result in results)  # objective of the solvers, see pallet_cost
+    return cost if results else None, len(results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, nargs='+', default=[30, 50, 70, 150])
+    parser.add_argument('--orders', type=int, default=3, help='Orders per size')
+    parser.add_argument('--time-limit', type=float, default=10, help='Time limit of a solve in seconds')
+    parser.add_argument('--engines', nargs='+', default=list(solverpool.SOLVERS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warm-start', action='store_true',
+                        help='Give the solver the first-fit decreasing packing as its warm start')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'{"units":>6} {"order":>5} ' + ' '.join(f'{engine + " cost":>16} {"pallets":>7} {"seconds":>8}'
+                                                    for engine in args.engines))
+    for units in args.units:
+        for n in range(args.orders):
+            table = ItemTable.from_payload(random_order(units, rng))
+            items = table.expand()
+            pallets = freight.create_pallets(table, DEFAULT_CATALOG)
+
+            columns = []
+            for engine in args.engines:
+                cost, count, elapsed = run(engine, items, pallets, args.time_limit, args.warm_start)
+                columns.append(f'{"-" if cost is None else f"{cost:.3f}":>16} {count:>7} {elapsed:>8.2f}')
+            print(f'{units:>6} {n:>5} ' + ' '.join(columns), flush=True)
+
+
+if __name__ == '__main__':
+    main()
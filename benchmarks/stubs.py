@@ -0,0 +1,148 @@
+"""
+Local stand-ins for Cognito and Secrets Manager, to run the app offline.
+"""
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from jose import jwt
+
+KEY_ID = 'local-key'
+USER_POOL_ID = 'local-pool'
+CLIENT_ID = 'local-client'
+
+
+def b64url_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+class TokenIssuer:
+    """
+    Issues RS256 tokens for the user pool, signed with a key generated on creation. Tokens are shaped like Cognito
+    access tokens, which carry the app client in `client_id` rather than in `aud`.
+    """
+
+    def __init__(self, kid=KEY_ID, client_id=CLIENT_ID, bits=2048):
+        public_key, private_key = rsa.newkeys(bits)
+        self.kid = kid
+        self.client_id = client_id
+        self.private_pem = private_key.save_pkcs1().decode()
+        self.jwk = {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'alg': 'RS256',
+                    'n': b64url_uint(public_key.n), 'e': b64url_uint(public_key.e)}
+
+    def issue(self, ttl=3600, **claims):
+        now = int(time.time())
+        claims = {'sub': 'load-test', 'client_id': self.client_id, 'token_use': 'access', 'iat': now,
+                  'exp': now + ttl, **claims}
+        return jwt.encode(claims, self.private_pem, algorithm='RS256', headers={'kid': self.kid})
+
+
+class StubServer:
+    """
+    An HTTP server on a local port, answering from a thread with `handle(method, path, headers, body)`, which
+    returns the status, the content type and the body. Every answer is delayed by `latency` seconds, like a remote
+    service.
+    """
+
+    def __init__(self, handle, latency=0.0, host='127.0.0.1', port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # keep-alive clients would otherwise wait on delayed ACKs
+
+            def answer(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                time.sleep(stub.latency)
+                status, content_type, content = stub.handle(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = answer
+
+            def log_message(self, format, *args):
+                pass
+
+        self.handle = handle
+        self.latency = latency
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='stub-server', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def jwks_server(issuer, latency=0.0):
+    """
+    Returns a stub of the Cognito identity provider endpoint serving the key of `issuer`, to be set as
+    `COGNITO_IDP_ENDPOINT`.
+    """
+    keys = json.dumps({'keys': [issuer.jwk]}).encode()
+
+    def handle(method, path, headers, body):
+        if path.endswith('/.well-known/jwks.json'):
+            return 200, 'application/json', keys
+        return 404, 'application/json', b'{}'
+
+    return StubServer(handle, latency)
+
+
+def local_credentials(issuer):
+    """
+    Returns the environment variables of the local credentials matching `issuer`, see `secret.get_local_credentials`.
+    """
+    return {'APP_ENV': 'development', 'USER_POOL_ID': USER_POOL_ID, 'APP_CLIENT_ID': issuer.client_id,
+            'AWS_REGION': 'us-east-1'}
+
+
+def credentials(issuer):
+    """
+    Returns the credentials matching `issuer`, in the format of `secret.get_credentials`.
+    """
+    return {'user_pool_id': USER_POOL_ID, 'client_id': issuer.client_id, 'client_secret': None,
+            'aws_region': 'us-east-1', 'cognito_domain': None, 'username': None, 'password': None,
+            'access_token': None, 'id_token': None, 'refresh_token': None}
+
+
+def secrets_manager_server(issuer, env='staging', latency=0.0):
+    """
+    Returns a stub of Secrets Manager answering `GetSecretValue` for the credentials secret of `env` with the
+    credentials of `issuer`, to be set as `SECRETS_MANAGER_ENDPOINT_URL`.
+    """
+    secret_name = f'/smart-packing/{env}/credentials'
+    secret = {'ARN': f'arn:aws:secretsmanager:us-east-1:000000000000:secret:{secret_name}', 'Name': secret_name,
+              'SecretString': json.dumps(credentials(issuer))}
+
+    def handle(method, path, headers, body):
+        target = headers.get('X-Amz-Target', '')
+        request = json.loads(body or b'{}')
+        if target == 'secretsmanager.GetSecretValue' and request.get('SecretId') == secret_name:
+            return 200, 'application/x-amz-json-1.1', json.dumps(secret).encode()
+        error = {'__type': 'ResourceNotFoundException', 'message': "Secrets Manager can't find the specified secret."}
+        return 400, 'application/x-amz-json-1.1', json.dumps(error).encode()
+
+    return StubServer(handle, latency)
+
+
+def stored_credentials(secrets_manager, env='staging'):
+    """
+    Returns the environment variables that make the app read its credentials from the `secrets_manager` stub.
+    """
+    return {'APP_ENV': env, 'SECRETS_MANAGER_ENDPOINT_URL': secrets_manager.url,
+            'SECRETS_MANAGER_AWS_ACCESS_KEY_ID': 'local', 'SECRETS_MANAGER_AWS_SECRET_ACCESS_KEY': 'local',
+            'SECRETS_MANAGER_AWS_REGION': 'us-east-1'}
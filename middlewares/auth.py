@@ -1,7 +1,9 @@
+import asyncio
 import base64
 import hashlib
 import hmac
 import logging
+import os
 import time
 
 import boto3
@@ -10,23 +12,45 @@ from botocore.exceptions import ClientError
 from flask import request, jsonify
 from jose import jwt
 
-from utils import secret
+from utils import secret, tracing
 
 logger = logging.getLogger(__name__)
 
 
+# URL of the JSON web keys of the Cognito user pool
+def get_jwks_url(cred):
+    endpoint = os.getenv('COGNITO_IDP_ENDPOINT', f'https://cognito-idp.{cred["aws_region"]}.amazonaws.com')
+    return f'{endpoint}/{cred["user_pool_id"]}/.well-known/jwks.json'
+
+
 # Cognito JWT Token Verification
+@tracing.traced('auth.verify_jwt')
 def verify_jwt(token):
     cred = secret.get_credentials()
+    keys_url = get_jwks_url(cred)
+
+    with tracing.span('auth.jwks_fetch', url=keys_url):
+        response = requests.get(keys_url)
+        keys = response.json().get('keys')
+
+    return decode_jwt(token, keys, cred['client_id'])
+
+
+# Cognito JWT Token Verification without blocking the event loop, for the ASGI app
+async def verify_jwt_async(token, client):
+    with tracing.span('auth.verify_jwt'):
+        cred = await asyncio.to_thread(secret.get_credentials)
+        keys_url = get_jwks_url(cred)
 
-    aws_region = cred['aws_region']
-    user_pool_id = cred['user_pool_id']
-    client_id = cred['client_id']
-    keys_url = f'https://cognito-idp.{aws_region}.amazonaws.com/{user_pool_id}/.well-known/jwks.json'
+        with tracing.span('auth.jwks_fetch', url=keys_url):
+            response = await client.get(keys_url)
+            keys = response.json().get('keys')
 
-    response = requests.get(keys_url)
-    keys = response.json().get('keys')
+        return decode_jwt(token, keys, cred['client_id'])
 
+
+# Verify a token against the JSON web keys of the user pool
+def decode_jwt(token, keys, client_id):
     try:
         unverified_header = jwt.get_unverified_header(token)
         rsa_key = {}
@@ -59,6 +83,7 @@ def is_token_expired(token):
 
 
 # Middleware for authentication
+@tracing.traced('auth.authenticate')
 def authenticate():
     auth_header = request.headers.get('Authorization')
     if not auth_header:
@@ -72,6 +97,20 @@ def authenticate():
     return payload, None
 
 
+# Authentication for the ASGI app, see `authenticate`
+async def authenticate_async(auth_header, client):
+    with tracing.span('auth.authenticate'):
+        if not auth_header:
+            return None, None
+
+        token = auth_header.split(" ")[1]
+        if is_token_expired(token):
+            return None, token  # Return the expired token
+
+        payload = await verify_jwt_async(token, client)
+        return payload, None
+
+
 def refresh_tokens(client_id, client_secret, refresh_token_value, region, user_pool_id):
     cred = secret.get_credentials()
     cognito_domain = cred['cognito_domain']
@@ -0,0 +1,37 @@
+import hmac
+import os
+
+from flask import request, jsonify, make_response
+
+from utils.profiling import Profiler
+
+
+# Check the token a request asks to be profiled with
+def is_profiling_allowed(requested):
+    token = os.getenv('PROFILING_TOKEN')
+    if not token:
+        return False
+
+    # Compared as bytes: compare_digest rejects str with non-ASCII characters
+    return hmac.compare_digest(requested.encode(), token.encode())
+
+
+# Middleware for opt-in profiling. It wraps the authentication so that the profile covers it.
+def profiled(f):
+    def wrapper(*args, **kwargs):
+        requested = request.headers.get('X-Profile') or request.args.get('profile')
+        if not requested:
+            return f(*args, **kwargs)
+
+        if not is_profiling_allowed(requested):
+            return jsonify({"message": "Profiling not allowed"}), 403
+
+        with Profiler(f.__name__) as profiler:
+            response = make_response(f(*args, **kwargs))
+
+        if profiler.name:
+            response.headers['X-Profile-Id'] = profiler.name
+        return response
+
+    wrapper.__name__ = f.__name__  # Preserve function name
+    return wrapper
@@ -0,0 +1,21 @@
+from flask import request, make_response
+
+from utils import tracing
+
+
+# Middleware for request tracing. It starts the root span of the request, continuing the trace of the caller.
+def traced_request(f):
+    def wrapper(*args, **kwargs):
+        if not tracing.is_enabled():
+            return f(*args, **kwargs)
+
+        trace_id, parent_id = tracing.parse_trace_headers(request.headers)
+        with tracing.span(f'{request.method} {request.path}', trace_id=trace_id, parent_id=parent_id) as span:
+            response = make_response(f(*args, **kwargs))
+            span.set_attribute('http.status_code', response.status_code)
+
+        response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    wrapper.__name__ = f.__name__  # Preserve function name
+    return wrapper
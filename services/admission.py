@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Actions of the admission controller, from the cheapest to the most drastic
+FULL = 'full'
+SHORTENED = 'shortened'
+DEGRADED = 'degraded'
+REJECTED = 'rejected'
+
+
+class Overloaded(Exception):
+    """
+    Raised when a solve is rejected because the process is overloaded.
+
+    Attributes:
+        retry_after (int): Seconds after which the client may retry.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Admission:
+    """
+    The decision taken for one solve.
+
+    Attributes:
+        action (str): FULL, SHORTENED, DEGRADED or REJECTED.
+        in_flight (int): Solves in flight in this process when the decision was taken, this one excluded.
+        queued (int): Solves waiting for a solver process when the decision was taken.
+        timeout (float): Time budget of the solve in seconds, or None for the default budget.
+    """
+    action: str
+    in_flight: int
+    queued: int
+    timeout: float = None
+
+    def to_dict(self):
+        report = {'action': self.action, 'in_flight': self.in_flight, 'queued': self.queued}
+        if self.timeout is not None:
+            report['timeout'] = self.timeout
+        return report
+
+
+class AdmissionController:
+    """
+    Decides how much solver work a request gets from the load of the process.
+
+    The load is the number of solves in flight in the process, queued ones included. From `shorten_at` solves in
+    flight, new solves get `short_timeout` seconds instead of the default budget; from `degrade_at`, or when the solver
+    pool has no free slot, they are replaced by a heuristic packing; from `reject_at` they are rejected. A threshold
+    of 0 disables its action.
+
+    Example usage:
+        controller = AdmissionController(shorten_at=4, degrade_at=8, reject_at=16)
+        with controller.admit(pool) as admission:
+            if admission.action == DEGRADED:
+                ...
+    """
+
+    def __init__(self, shorten_at=0, degrade_at=0, reject_at=0, short_timeout=2.0, retry_after=1):
+        self.shorten_at = shorten_at
+        self.degrade_at = degrade_at
+        self.reject_at = reject_at
+        self.short_timeout = short_timeout
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self):
+        """
+        Returns the number of admitted solves that have not finished.
+        """
+        return self._in_flight
+
+    def decide(self, pool=None):
+        """
+        Decides the action for a new solve, without admitting it.
+
+        Args:
+            pool (SolverPool, optional): The solver pool the solve would run in.
+
+        Returns:
+            Admission: The decision.
+        """
+        in_flight = self._in_flight
+        queued = pool.queued if pool is not None else 0
+        pool_full = pool is not None and pool.running + pool.queued >= pool.workers + pool.max_queue
+
+        if self.reject_at and in_flight >= self.reject_at:
+            return Admission(REJECTED, in_flight, queued)
+        if pool_full or (self.degrade_at and in_flight >= self.degrade_at):
+            return Admission(DEGRADED, in_flight, queued)
+        if self.shorten_at and in_flight >= self.shorten_at:
+            return Admission(SHORTENED, in_flight, queued, self.short_timeout)
+        return Admission(FULL, in_flight, queued)
+
+    @contextmanager
+    def admit(self, pool=None):
+        """
+        Admits a solve for the duration of the block.
+
+        Args:
+            pool (SolverPool, optional): The solver pool the solve runs in.
+
+        Yields:
+            Admission: The decision. Degraded solves are counted as in flight too, as they still take CPU time.
+
+        Raises:
+            Overloaded: If the solve is rejected.
+        """
+        with self._lock:
+            admission = self.decide(pool)
+            if admission.action == REJECTED:
+                raise Overloaded(f'{admission.in_flight} solves in flight', self.retry_after)
+            self._in_flight += 1
+
+        if admission.action != FULL:
+            logger.info('Solve %s with %d solves in flight and %d queued',
+                        admission.action, admission.in_flight, admission.queued)
+        try:
+            yield admission
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def from_env():
+    """
+    Creates the admission controller from `ADMISSION_SHORTEN_AT`, `ADMISSION_DEGRADE_AT` and `ADMISSION_REJECT_AT`
+    (solves in flight per web worker, 0 or unset disables the action), `ADMISSION_SHORT_TIMEOUT` in seconds
+    (default 2) and `ADMISSION_RETRY_AFTER` in seconds (default 1).
+
+    Returns:
+        AdmissionController:
+    """
+    return AdmissionController(shorten_at=int(os.getenv('ADMISSION_SHORTEN_AT', '0')),
+                               degrade_at=int(os.getenv('ADMISSION_DEGRADE_AT', '0')),
+                               reject_at=int(os.getenv('ADMISSION_REJECT_AT', '0')),
+                               short_timeout=float(os.getenv('ADMISSION_SHORT_TIMEOUT', '2')),
+                               retry_after=int(os.getenv('ADMISSION_RETRY_AFTER', '1')))
@@ -1,32 +1,133 @@
+import contextvars
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from solvers.palletsolver import Item, Pallet, PalletOptimizer
+from services import admission, singleflight, solverpool
+from solvers import bounds, chunksolver, skylinesolver
+from solvers.itemtable import ItemTable
+from solvers.palletcatalog import DEFAULT_CATALOG
+from solvers.palletsolver import Item, pallet_result
+from solvers.aggregatesolver import AggregateSolver
 from solvers.empicalsolver import EmpiricalSolver
+from utils import profiling, tracing
 
 logger = logging.getLogger(__name__)
 
+coalescer = singleflight.Singleflight(directory=os.getenv('SINGLEFLIGHT_DIR'),
+                                      timeout=float(os.getenv('SINGLEFLIGHT_TIMEOUT', '30')))
 
-def pack(items):
-    total_quantity = sum(item['quantity'] for item in items)
+admission_controller = admission.from_env()
+
+
+@tracing.traced('freight.pack')
+def pack(items, catalog=DEFAULT_CATALOG, report=None, cancelled=None):
+    """
+    Packs the items of an order into pallets.
+
+    `items` is either a list of per-line dicts (the record format) or a dict of parallel
+    arrays keyed by field name (the columnar format). Both are validated and converted to
+    an `ItemTable` once, before any solver runs. `catalog` is the `PalletCatalog` the
+    pallets are chosen from.
+
+    If `report` is given, it is filled with how the pallets were produced:
+    - engine (str): 'bound', 'optimal', 'chunked', 'heuristic' or 'empirical'.
+    - proven_optimal (bool): True if the pallets were proven optimal by the lower bounds,
+      without running the solver.
+    - solver (str): The solver engine, 'assignment' or 'pattern', if the solver ran.
+    - warm_start (bool): True if the solver was given the heuristic packing as its fallback,
+      if the solver ran and `WARM_START` is not 'false'.
+    - fallback (str): Why the solver result was not used ('busy', 'timeout' or 'error'), if so.
+    - admission (dict): The admission decision of the solve, if the solver was needed: the
+      action ('full', 'shortened' or 'degraded'), the solves in flight and queued, and the
+      shortened time budget.
+    - chunks (int): Number of chunks a large order was solved in.
+    - heuristic_chunks (int): Number of those chunks packed by the heuristic instead of the
+      solver.
+    - consolidated (int): Number of pallets saved by merging under-filled pallets of the chunks.
+    - deadline_reached (bool): True if `CHUNK_DEADLINE` ran out, so that chunks were left to the
+      heuristic and the pallets were not consolidated.
+    - coalesced (bool): True if the pallets were shared from an identical concurrent request.
+
+    Concurrent identical orders are packed once: the first request packs the order and the
+    others wait for it, up to `SINGLEFLIGHT_TIMEOUT` seconds (default 30). With
+    `SINGLEFLIGHT_DIR` set, orders are also coalesced across the processes of the host.
+
+    `cancelled` is polled while the solver runs in the solver pool; once it returns True for
+    every request waiting on the solve, the solve is abandoned.
+
+    Profiled requests are neither coalesced nor sent to the solver pool, so that the profile
+    covers the whole pack.
+
+    Raises:
+    -------
+    ValueError
+        If the items are malformed.
+    SolverCancelled
+        If the solve was cancelled.
+    SingleflightTimeout
+        If the identical request this one waited on did not finish in time.
+    Overloaded
+        If the solve was rejected by the admission controller.
+    """
+    report = {} if report is None else report
+
+    items = ItemTable.from_payload(items)
+    if profiling.is_active():
+        report['coalesced'] = False
+        return pack_order(items, catalog, report, cancelled)
+
+    key = f'{catalog.name}-{items.fingerprint()}'
+
+    def pack_once(cancelled_all):
+        shared_report = {}
+        return pack_order(items, catalog, shared_report, cancelled_all), shared_report
+
+    (pallets, shared_report), coalesced = coalescer.do(key, pack_once, cancelled)
+    report.update(shared_report)
+    report['coalesced'] = coalesced
+
+    return pallets
+
+
+def pack_order(items, catalog=DEFAULT_CATALOG, report=None, cancelled=None):
+    """
+    Packs the items of an order into pallets, see `pack`.
+    """
+    report = {} if report is None else report
+    report['proven_optimal'] = False
+
+    items = ItemTable.from_payload(items)
+    total_quantity = items.total_quantity
 
-    # Go with empirical packs
     if total_quantity > 70:
+        # Go with chunked optimal packs
+        if total_quantity <= int(os.getenv('CHUNKED_MAX_UNITS', '2000')):
+            logger.debug('Go with chunked packs')
+            pallets = create_chunked_packs(items, catalog, report, cancelled)
+            if len(pallets) > 0:
+                return pallets
+
+        # Go with empirical packs
         logger.debug('XXXXXX-1 Go with empirical packs')
-        return create_empirical_packs(items)
+        report['engine'] = 'empirical'
+        return create_empirical_packs(items, catalog)
 
     logger.debug('XXXXXX-2 Go with optimal packs')
 
     # Go with optimal packs
-    pallets = create_optimal_packs(items)
+    pallets = create_optimal_packs(items, catalog, report, cancelled)
     if len(pallets) > 0:
         return pallets
 
     # Fallback to empirical packs
     logger.debug('XXXXXX-3 Go with empirical packs')
-    return create_empirical_packs(items)
+    report['engine'] = 'empirical'
+    return create_empirical_packs(items, catalog)
 
 
-def create_optimal_packs(items):
+def create_optimal_packs(items, catalog=DEFAULT_CATALOG, report=None, cancelled=None):
     """
     Creates optimal pallet packs for a given list of items.
 
@@ -36,10 +137,10 @@ def create_optimal_packs(items):
 
     Parameters:
     -----------
-    items : list
-        A list of dictionaries where each dictionary represents an item. The items
-        should include attributes such as SKU, weight, dimensions, and other relevant
-        packing constraints.
+    items : ItemTable or list
+        The order lines, either as an `ItemTable` or as a list of dictionaries where each
+        dictionary represents an item. The items should include attributes such as SKU,
+        weight, dimensions, and other relevant packing constraints.
 
     Returns:
     --------
@@ -53,11 +154,16 @@ def create_optimal_packs(items):
     --------------------------
     - _create_items(items): Converts the input list of dictionaries into item objects
       required by the optimizer.
-    - _create_pallets(items): Creates a list of available pallet types based on the
-      items to be packed.
-    - PalletOptimizer(items, pallets): Initializes the pallet optimizer with the
-      created items and pallets.
-    - solve(): Solves the packing problem and returns the optimized solution.
+    - _create_pallets(items, catalog): Looks up the candidate pallet of every unit in
+      the pallet catalog.
+    - bounds.solve_if_trivial(items, pallets): Returns a heuristic packing without
+      running the optimizer when it matches the lower bound on the objective.
+    - admission_controller.admit(pool): Decides from the load of the process whether the
+      optimizer runs with its full time budget, a shortened one, or is replaced by the
+      heuristic packing.
+    - apply_heights(pallets): Computes the pallet heights and item positions.
+    - solve_optimal(items, pallets): Solves the packing problem with the pallet
+      optimizer, in the solver pool if it is enabled.
 
     Example:
     --------
@@ -74,43 +180,231 @@ def create_optimal_packs(items):
     - The function is intended for internal use, as indicated by the leading underscore in its name.
     - The actual output format and details depend on the `solve` method of the `PalletOptimizer` class.
     """
-    items = create_items(items)
-    pallets = create_pallets(items)
-    optimizer = PalletOptimizer(items, pallets)
+    table = ItemTable.from_payload(items)
+    items = table.expand()
+    pallets = create_pallets(table, catalog)
+    report = {} if report is None else report
 
-    return optimizer.solve()
+    proven = bounds.solve_if_trivial(items, pallets)
+    if proven is not None:
+        logger.info('Packed %d units on %d pallets, proven optimal by bounds', len(items), len(proven))
+        report['engine'] = 'bound'
+        report['proven_optimal'] = True
+        return apply_heights(proven)
 
+    pool = None if profiling.is_active() else solverpool.get_pool()
+    with admission_controller.admit(pool) as admitted:
+        report['admission'] = admitted.to_dict()
+        if admitted.action == admission.DEGRADED:
+            report['engine'] = 'heuristic'
+            return apply_heights(solve_heuristic(items, pallets))
 
-def create_empirical_packs(items):
-    empirical = EmpiricalSolver(items)
+        report['engine'] = 'optimal'
+        return apply_heights(solve_optimal(items, pallets, report, cancelled, pool, admitted.timeout))
 
-    return empirical.solve()
 
+def create_chunked_packs(items, catalog=DEFAULT_CATALOG, report=None, cancelled=None):
+    """
+    Creates pallet packs for an order too large for a single solve.
 
-def create_items(items):
-    return [Item(sku=x['sku'], weight=x['weight'], length=x['length'], width=x['width'],
-                 height=x['height'], assembled=x['assembled'], bundled=x['bundled'])
-            for x in items for _ in range(x['quantity'])]
+    The units are split into chunks of `CHUNK_SIZE` units (default 40) of the same item class
+    and similar size, see `chunksolver.partition`. The chunks are solved concurrently, on
+    `CHUNK_WORKERS` threads (default: the number of CPUs, 1 on Lambda) or on the solver pool
+    if it is enabled, each within `CHUNK_TIMEOUT` seconds (default 5). A chunk the solver
+    cannot pack in time is packed by the heuristic. The under-filled pallets of the chunks are then merged,
+    see `chunksolver.consolidate`.
+
+    The whole chunk phase is bounded by `CHUNK_DEADLINE` seconds (default 15), well below the
+    29 s cut-off of API Gateway. Chunk solves are shortened to the time left, and once less
+    than a second is left the remaining chunks are packed by the heuristic and the pallets
+    are not consolidated.
+
+    Returns no pallets if some chunk could not be packed at all, so the caller falls back to
+    empirical packs.
+    """
+    table = ItemTable.from_payload(items)
+    items = table.expand()
+    pallets = create_pallets(table, catalog)
+    report = {} if report is None else report
+    chunk_size = int(os.getenv('CHUNK_SIZE', '40'))
+    deadline = time.monotonic() + float(os.getenv('CHUNK_DEADLINE', '15'))
+
+    pool = None if profiling.is_active() else solverpool.get_pool()
+    with admission_controller.admit(pool) as admitted:
+        report['admission'] = admitted.to_dict()
+        if admitted.action == admission.DEGRADED:
+            report['engine'] = 'heuristic'
+            return apply_heights(solve_heuristic(items, pallets))
 
+        report['engine'] = 'chunked'
+        report['solver'] = solverpool.get_engine()
+        timeout = admitted.timeout or float(os.getenv('CHUNK_TIMEOUT', '5'))
+        fallbacks = []
 
-def create_pallets(items):
-    return [create_item_pallet(item) for item in items]
+        def solve_chunk(chunk_items, chunk_pallets):
+            if cancelled is not None and cancelled():
+                raise solverpool.SolverCancelled('chunked solve cancelled')
 
+            proven = bounds.solve_if_trivial(chunk_items, chunk_pallets)
+            if proven is not None:
+                return proven
 
-def create_item_pallet(item: Item):
-    # Bundle item
-    if item.bundled:
-        return Pallet(max_volume=9650, length=98, width=10, weight=3, type='BD', assembled=False, size=96)
+            # Less than a second left is not worth a solve
+            remaining = deadline - time.monotonic()
+            if remaining >= 1:
+                packs = solve_optimal(chunk_items, chunk_pallets, {}, cancelled, pool, min(timeout, remaining))
+                if packs:
+                    return packs
 
-    # assembled item
-    if item.assembled:
-        if item.length <= 55:
-            return Pallet(max_volume=144738, length=55, width=48, weight=68, type='PLT5', assembled=True, size=15)
+            fallbacks.append(len(chunk_items))
+            return solve_heuristic(chunk_items, chunk_pallets)
+
+        chunks = chunksolver.partition(items, pallets, chunk_size)
+        results = solve_chunks(solve_chunk, chunks, pool)
+        if not all(results):
+            return []
+        # Counted before consolidation, whose re-solves also go through `solve_chunk`
+        heuristic_chunks = len(fallbacks)
+
+        packs = [pack for result in results for pack in result]
+        out_of_time = deadline - time.monotonic() < 1
+        if out_of_time:
+            logger.warning('Chunk deadline reached, skipping consolidation')
+            consolidated = packs
         else:
-            return Pallet(max_volume=131090, length=102, width=45.5, weight=78, type='PLT8', assembled=True, size=18)
-    # RTA item
-    if item.length <= 48:
-        return Pallet(max_volume=58372, length=48, width=40.5, weight=35, type='PLT4', assembled=False, size=4)
-    elif item.length <= 70:
-        return Pallet(max_volume=236275, length=70, width=45, weight=70, type='PLT6', assembled=False, size=6)
-    return Pallet(max_volume=176256, length=102, width=45.5, weight=78, type='PLT8', assembled=False, size=8)
+            consolidated = chunksolver.consolidate(packs, pallets, solve_chunk, chunk_size)
+        logger.info('Packed %d units in %d chunks on %d pallets', len(items), len(chunks), len(consolidated))
+
+        report['chunks'] = len(chunks)
+        report['heuristic_chunks'] = heuristic_chunks
+        report['consolidated'] = len(packs) - len(consolidated)
+        report['deadline_reached'] = out_of_time
+
+        return apply_heights(consolidated)
+
+
+def solve_chunks(solve_chunk, chunks, pool=None):
+    """
+    Solves chunks concurrently, as many at a time as the solver pool has workers, or as
+    `CHUNK_WORKERS` otherwise (default: the number of CPUs, 1 on Lambda). While profiling,
+    the chunks are solved one after the other in the request thread, so that the profile
+    covers them.
+    """
+    if profiling.is_active():
+        return [solve_chunk(*chunk) for chunk in chunks]
+
+    # Lambda functions get less than a CPU at the default memory size, although the runtime reports two
+    default_workers = 1 if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else os.cpu_count() or 1
+    workers = pool.workers if pool is not None else int(os.getenv('CHUNK_WORKERS', str(default_workers)))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Each chunk runs in a copy of the request context, so that its spans join the request trace
+        futures = [executor.submit(contextvars.copy_context().run, solve_chunk, *chunk) for chunk in chunks]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def solve_heuristic(items, pallets):
+    """
+    Packs the items with the first-fit decreasing heuristic of `bounds`, without the optimizer.
+    Returns no pallets if the heuristic finds no packing, so the caller falls back to empirical packs.
+    """
+    _, packing = bounds.heuristic_solution(items, pallets)
+    if packing is None:
+        return []
+
+    return [pallet_result(pallet, [items[i] for i in indices]) for pallet, indices in packing]
+
+
+def solve_optimal(items, pallets, report=None, cancelled=None, pool=None, timeout=None):
+    """
+    Solves the packing problem with the solver engine set by `PACK_ENGINE`, see
+    `solverpool.get_engine`.
+
+    With a solver `pool` the solve runs in a worker process under a hard timeout; a full pool
+    or a timeout counts as no solution, so the caller falls back to empirical packs.
+    Otherwise the solve runs in-process. `timeout` in seconds overrides the default time
+    budget of the solve, `SOLVER_TIMEOUT` seconds (default 10) in either case.
+
+    Unless `WARM_START` is 'false', the solver is given the first-fit decreasing packing as a
+    fallback, so it returns a packing at least as good as the heuristic even when the time
+    budget runs out before optimality is proven.
+    """
+    report = {} if report is None else report
+    engine = solverpool.get_engine()
+    report['solver'] = engine
+
+    warm_start = None
+    if os.getenv('WARM_START', 'true').lower() != 'false':
+        _, warm_start = bounds.heuristic_solution(items, pallets)
+        report['warm_start'] = warm_start is not None
+
+    if pool is None:
+        time_limit = (timeout or float(os.getenv('SOLVER_TIMEOUT', '10'))) * 1000
+        return solverpool.SOLVERS[engine](items, pallets, time_limit=time_limit, tracer=tracing.span,
+                                          warm_start=warm_start).solve()
+
+    try:
+        return pool.solve(items, pallets, timeout=timeout, cancelled=cancelled, engine=engine,
+                          warm_start=warm_start)
+    except solverpool.SolverPoolFull as e:
+        logger.warning('Solver pool full: %s', e)
+        report['fallback'] = 'busy'
+    except solverpool.SolverTimeout as e:
+        logger.warning('Solver timed out: %s', e)
+        report['fallback'] = 'timeout'
+    except solverpool.SolverCancelled:
+        raise
+    except solverpool.SolverPoolError as e:
+        logger.error('Solver failed: %s', e)
+        report['fallback'] = 'error'
+
+    return []
+
+
+def apply_heights(pallets):
+    """
+    Replaces the volume-based pallet heights with the heights of a geometric packing, unless
+    `HEIGHT_ENGINE` is set to 'volume'.
+    """
+    if os.getenv('HEIGHT_ENGINE', 'skyline') == 'skyline':
+        skylinesolver.apply_heights(pallets)
+
+    return pallets
+
+
+def create_empirical_packs(items, catalog=DEFAULT_CATALOG):
+    """
+    Packs the order line by line with `AggregateSolver`, or by total weight with `EmpiricalSolver`
+    if `EMPIRICAL_ENGINE` is set to 'weight'. The pallet heights of `AggregateSolver` are those of
+    a geometric packing unless `HEIGHT_ENGINE` is set to 'volume', see
+    `skylinesolver.apply_line_heights`.
+    """
+    if os.getenv('EMPIRICAL_ENGINE', 'aggregate') == 'weight':
+        return EmpiricalSolver(items, catalog).solve()
+
+    pallets = AggregateSolver(items, catalog).solve()
+    if os.getenv('HEIGHT_ENGINE', 'skyline') == 'skyline':
+        skylinesolver.apply_line_heights(pallets)
+
+    return pallets
+
+
+def create_items(items):
+    return ItemTable.from_payload(items).expand()
+
+
+def create_pallets(items, catalog=DEFAULT_CATALOG):
+    """
+    Returns the candidate pallet of every unit of an order, as shared catalog specs.
+    """
+    table = ItemTable.from_payload(items)
+    return [pallet for pallet, quantity in zip(catalog.pallets_for(table), table.quantity.tolist())
+            for _ in range(quantity)]
+
+
+def create_item_pallet(item: Item, catalog=DEFAULT_CATALOG):
+    return catalog.pallet_for(item.bundled, item.assembled, item.length)
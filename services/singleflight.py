@@ -0,0 +1,225 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SingleflightTimeout(TimeoutError):
+    """
+    Raised when a waiter gives up on a call made by another request.
+    """
+
+
+def _gone():
+    return True
+
+
+class _Call:
+    """
+    An in-flight call and the cancellation callbacks of the requests waiting on it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = []
+
+    def cancelled(self):
+        # The call is only cancelled once nobody wants its result anymore
+        return all(waiter is not None and waiter() for waiter in self.waiters)
+
+
+class Group:
+    """
+    Coalesces concurrent calls with the same key within a process.
+
+    The first caller of a key runs the function; callers arriving while it runs wait for it and share its
+    result or exception. The function receives a `cancelled` callback that returns True once every waiter
+    has been cancelled or has timed out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None, cancelled=None):
+        """
+        Runs `fn(cancelled)` once for all concurrent callers of `key`.
+
+        Args:
+            key (str): The key of the call.
+            fn (callable): The function to run; it receives the shared cancellation callback.
+            timeout (float, optional): How long a waiter waits for another caller's call, in seconds.
+            cancelled (callable, optional): Returns True once this caller no longer wants the result.
+
+        Returns:
+            tuple: The result and True if it was shared from another caller's call.
+
+        Raises:
+            SingleflightTimeout: If the call made by another caller did not finish in time.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            index = len(call.waiters)
+            call.waiters.append(cancelled)
+
+        if leader:
+            try:
+                call.result = fn(call.cancelled)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            call.waiters[index] = _gone
+            raise SingleflightTimeout(f'timed out after {timeout}s waiting for a concurrent identical request')
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader
+
+
+class FileGroup:
+    """
+    Coalesces concurrent calls with the same key across the processes of a host.
+
+    Each key has a lock file in `directory`. The process holding its lock runs the function and writes the
+    JSON-serializable result into the file before releasing the lock; processes that were waiting for the lock
+    read that result instead of running the function. Lock files not used for `ttl` seconds are removed, unless
+    their lock is held.
+    """
+
+    def __init__(self, directory, ttl=300, poll_interval=0.02):
+        self.directory = directory
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._last_sweep = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def do(self, key, fn, timeout=None, cancelled=None):
+        """
+        Runs `fn(cancelled)` once for all concurrent callers of `key` on the host.
+
+        Args are the same as `Group.do`. If the process running the call fails, waiters run the function themselves.
+        """
+        path = os.path.join(self.directory, f'{key}.lock')
+        started = time.time()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with open(path, 'a+') as f:
+                waited = False
+                while True:
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        waited = True
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise SingleflightTimeout(
+                            f'timed out after {timeout}s waiting for a concurrent identical request')
+                    time.sleep(self.poll_interval)
+
+                try:
+                    if not self._is_current(f, path):
+                        continue  # the lock file was swept while waiting; lock the new one
+
+                    if waited:
+                        f.seek(0)
+                        shared = self._read(f, started)
+                        if shared is not None:
+                            return shared, True
+
+                    result = fn(cancelled if cancelled is not None else (lambda: False))
+                    f.seek(0)
+                    f.truncate()
+                    json.dump({'time': time.time(), 'result': result}, f)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+            self._sweep()
+            return result, False
+
+    @staticmethod
+    def _is_current(f, path):
+        # The lock only coalesces callers if the file is still the one at `path`
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _read(f, started):
+        # Only a result written while this caller was waiting belongs to the call it waited for
+        try:
+            data = json.load(f)
+        except ValueError:
+            return None
+        return data['result'] if data.get('time', 0) >= started else None
+
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.ttl:
+            return
+        self._last_sweep = now
+
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            try:
+                if filename.endswith('.lock') and now - os.path.getmtime(path) > self.ttl:
+                    self._remove_unlocked(path)
+            except OSError:
+                pass
+
+    def _remove_unlocked(self, path):
+        # The mtime only changes when a result is written, so a solve running longer than `ttl` still holds
+        # the lock of an old file; such files are skipped
+        with open(path, 'a+') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                if self._is_current(f, path):
+                    os.remove(path)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Singleflight:
+    """
+    Coalesces identical concurrent calls across threads and, if a directory is given, across processes.
+
+    Threads of a process first coalesce on a `Group`; the thread running the call then coalesces with the other
+    processes on a `FileGroup`.
+    """
+
+    def __init__(self, directory=None, timeout=None):
+        self.timeout = timeout
+        self._threads = Group()
+        self._processes = FileGroup(directory) if directory else None
+
+    def do(self, key, fn, cancelled=None):
+        """
+        Runs `fn(cancelled)` once for all concurrent callers of `key`, see `Group.do`.
+        """
+        if self._processes is None:
+            return self._threads.do(key, fn, self.timeout, cancelled)
+
+        def across_processes(cancelled_all):
+            return self._processes.do(key, fn, self.timeout, cancelled_all)
+
+        (result, shared_by_process), shared_by_thread = self._threads.do(key, across_processes, self.timeout,
+                                                                          cancelled)
+        return result, shared_by_process or shared_by_thread
@@ -0,0 +1,265 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from solvers.palletsolver import PalletOptimizer
+from solvers.patternsolver import PatternSolver
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+# Share of the job timeout given to SCIP as its own time limit, so that most slow solves stop by themselves
+# before the worker has to be killed.
+SOLVER_TIME_SHARE = 0.9
+
+# Solvers by engine name. They take the same arguments and return results in the same format.
+SOLVERS = {
+    'assignment': PalletOptimizer,
+    'pattern': PatternSolver,
+}
+DEFAULT_ENGINE = 'assignment'
+
+
+class SolverPoolError(Exception):
+    """
+    Base class of the errors raised by the solver pool.
+    """
+
+
+class SolverPoolFull(SolverPoolError):
+    """
+    Raised when a job is submitted while all workers are busy and the queue is full.
+    """
+
+
+class SolverTimeout(SolverPoolError):
+    """
+    Raised when a job does not finish in time. The worker running it is killed.
+    """
+
+
+class SolverCancelled(SolverPoolError):
+    """
+    Raised when a job is cancelled by its caller. The worker running it is killed.
+    """
+
+
+def _worker_main(conn):
+    """
+    Runs solver jobs received on a pipe until the pipe is closed.
+    """
+    while True:
+        try:
+            items, pallets, time_limit, engine, warm_start, trace_context = conn.recv()
+        except EOFError:
+            return
+
+        trace_id, parent_id = trace_context or (None, None)
+        try:
+            with tracing.span('solver.job', trace_id=trace_id, parent_id=parent_id, pid=os.getpid(), engine=engine):
+                result = ('ok', SOLVERS[engine](items, pallets, time_limit=time_limit, tracer=tracing.span,
+                                                 warm_start=warm_start).solve())
+        except Exception as e:
+            result = ('error', repr(e))
+        conn.send(result)
+
+
+class _Worker:
+    """
+    A solver worker process and the pipe to talk to it.
+    """
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SolverPool:
+    """
+    A fixed pool of solver worker processes.
+
+    Workers are forked from a fork server that has already imported OR-Tools, so they start warm and do not inherit
+    the threads of the web worker. Every job runs in its own worker under a hard wall-clock timeout; a worker whose
+    job times out or is cancelled is killed and replaced. At most `workers + max_queue` jobs are admitted at once.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        max_queue (int): Number of jobs that may wait for a worker.
+        timeout (float): Default wall-clock timeout of a job in seconds.
+        poll_interval (float): How often waiting jobs check for cancellation, in seconds.
+    """
+
+    def __init__(self, workers, max_queue=0, timeout=10.0, poll_interval=0.05):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+        self._context = multiprocessing.get_context('forkserver')
+        self._context.set_forkserver_preload(['solvers.palletsolver', 'solvers.patternsolver'])
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+
+        for _ in range(workers):
+            self._idle.put(_Worker(self._context))
+
+    @property
+    def running(self):
+        """
+        Returns the number of jobs currently running in a worker.
+        """
+        return self._running
+
+    @property
+    def queued(self):
+        """
+        Returns the number of jobs waiting for a worker.
+        """
+        return self._submitted - self._running
+
+    def _count(self, submitted=0, running=0):
+        with self._lock:
+            self._submitted += submitted
+            self._running += running
+
+    def _take_worker(self, deadline, cancelled):
+        while True:
+            try:
+                return self._idle.get(timeout=self.poll_interval)
+            except queue.Empty:
+                pass
+            if cancelled is not None and cancelled():
+                raise SolverCancelled('cancelled while waiting for a solver worker')
+            if time.monotonic() > deadline:
+                raise SolverTimeout('timed out while waiting for a solver worker')
+
+    def solve(self, items, pallets, timeout=None, cancelled=None, engine=None, warm_start=None):
+        """
+        Solves a packing problem in a worker process.
+
+        Args:
+            items (list[Item]): List of items to be packed.
+            pallets (list[Pallet]): List of available pallets.
+            timeout (float, optional): Wall-clock timeout of the job in seconds, queueing included.
+            cancelled (callable, optional): Returns True once the caller no longer wants the result.
+            engine (str, optional): Name of the solver in `SOLVERS`; defaults to `get_engine()`.
+            warm_start (list[tuple[Pallet, list[int]]], optional): A feasible packing the solver falls back to.
+
+        Returns:
+            list[dict]: The result of the solver, in the format of `PalletOptimizer.solve`.
+
+        Raises:
+            SolverPoolFull: If the pool and its queue are full.
+            SolverTimeout: If the job did not finish in time.
+            SolverCancelled: If the job was cancelled.
+            SolverPoolError: If the solver failed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        engine = engine or get_engine()
+        deadline = time.monotonic() + timeout
+
+        if not self._slots.acquire(blocking=False):
+            raise SolverPoolFull(f'{self.workers} solver workers busy and {self.max_queue} jobs queued')
+        self._count(submitted=1)
+
+        try:
+            worker = self._take_worker(deadline, cancelled)
+            self._count(running=1)
+            try:
+                worker.conn.send((items, pallets, int(timeout * SOLVER_TIME_SHARE * 1000), engine,
+                                  warm_start, tracing.current_context()))
+                while not worker.conn.poll(self.poll_interval):
+                    if cancelled is not None and cancelled():
+                        raise SolverCancelled('solver job cancelled')
+                    if time.monotonic() > deadline:
+                        raise SolverTimeout(f'solver job timed out after {timeout}s')
+                status, result = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                logger.warning('Solver worker %s died: %s', worker.process.pid, e)
+                worker.kill()
+                worker = _Worker(self._context)
+                raise SolverPoolError(f'solver worker died: {e}')
+            except BaseException:
+                logger.warning('Killing solver worker %s', worker.process.pid)
+                worker.kill()
+                worker = _Worker(self._context)
+                raise
+            finally:
+                self._count(running=-1)
+                self._idle.put(worker)
+        finally:
+            self._count(submitted=-1)
+            self._slots.release()
+
+        if status != 'ok':
+            raise SolverPoolError(result)
+        return result
+
+    def close(self):
+        """
+        Stops all idle workers.
+        """
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.kill()
+
+
+def get_engine():
+    """
+    Returns the name of the solver engine from `PACK_ENGINE`: 'assignment' (the default, `PalletOptimizer`) or
+    'pattern' (`PatternSolver`).
+    """
+    engine = os.getenv('PACK_ENGINE', DEFAULT_ENGINE).lower()
+    if engine not in SOLVERS:
+        logger.warning('Unknown PACK_ENGINE %s, using %s', engine, DEFAULT_ENGINE)
+        return DEFAULT_ENGINE
+    return engine
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the solver pool of this process, starting it on first use.
+
+    The pool is configured by `SOLVER_POOL_WORKERS` (0, the default, disables it and solves in-process),
+    `SOLVER_POOL_QUEUE` (default: as many as workers) and `SOLVER_TIMEOUT` in seconds (default 10). Each forked
+    web worker gets its own pool; call this from a gunicorn `post_fork` hook to start the workers ahead of traffic.
+
+    Returns:
+        SolverPool: The pool, or None if it is disabled.
+    """
+    global _pool, _pool_pid
+
+    workers = int(os.getenv('SOLVER_POOL_WORKERS', '0'))
+    if workers <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SolverPool(workers,
+                               max_queue=int(os.getenv('SOLVER_POOL_QUEUE', str(workers))),
+                               timeout=float(os.getenv('SOLVER_TIMEOUT', '10')))
+            _pool_pid = os.getpid()
+            logger.info('Started %d solver workers', workers)
+
+    return _pool
@@ -0,0 +1,225 @@
+import logging
+import math
+
+import numpy as np
+
+from solvers.itemtable import ItemTable
+from solvers.palletcatalog import DEFAULT_CATALOG, item_class
+from solvers.palletsolver import PALLET_HEIGHT, pallet_cost
+
+logger = logging.getLogger(__name__)
+
+# Minimum item height added to the stack height, as in `pallet_result`.
+MOCKUP_HEIGHT = 5
+
+
+class AggregateSolver:
+    """
+    Packs an order line by line instead of unit by unit.
+
+    Every line goes on the pallet type of its item class that packs it at the least cost per unit, among those whose
+    footprint fits the unit, turned 90 degrees or not, and whose height and weight limits allow it (see
+    `choose_pallet`). The lines of each pallet type are taken largest unit first: a line first tops up the open
+    pallet, then fills as many full pallets as its quantity allows, and the rest of it opens the next pallet. A pallet
+    is full when the next unit would exceed its volume, its stacking height or its weight limit. The work grows with
+    the number of lines and pallets, not with the number of units.
+
+    Pallets are returned in the format of `PalletOptimizer.get_results`, except that their items are lines with a
+    `quantity` rather than single units. The full pallets of a line are the same dict, repeated, so the result takes
+    memory per line rather than per pallet; copy a pallet before changing it.
+
+    Example usage:
+        pallets = AggregateSolver(items).solve()
+    """
+
+    def __init__(self, items, catalog=DEFAULT_CATALOG):
+        """
+        Args:
+            items (ItemTable or list): The order lines.
+            catalog (PalletCatalog, optional): The catalog the pallets are taken from.
+        """
+        self.items = ItemTable.from_payload(items)
+        self.catalog = catalog
+
+    def solve(self):
+        """
+        Packs the order.
+
+        Returns:
+            list[dict]: The pallets with the lines placed on them.
+        """
+        table = self.items
+        defaults = self.catalog.pallets_for(table)
+        volumes = table.length * table.width * table.height
+
+        groups = {}
+        for row in np.argsort(-volumes, kind='stable').tolist():
+            if table.quantity[row] > 0:
+                pallet = self.choose_pallet(row, float(volumes[row]), defaults[row])
+                groups.setdefault(pallet, []).append(row)
+
+        results = []
+        for pallet, rows in groups.items():
+            results.extend(self.pack_group(pallet, rows, volumes))
+
+        return results
+
+    def choose_pallet(self, row, volume, default):
+        """
+        Chooses the pallet type of a line: the pallet of its item class on which the line costs the least per unit,
+        counting the pallets the line alone would fill. Pallets whose footprint the unit fits in neither orientation,
+        whose stacking height is lower than the unit or whose weight limit is below it are left out. Ties go to the
+        catalog pallet of the line's length bucket, then to the smaller pallet. A line that fits no pallet of its class
+        goes on the largest one, see `pack_group`.
+
+        Args:
+            row (int): The line.
+            volume (float): The unit volume of the line.
+            default (Pallet): The catalog pallet of the line's item class and length.
+
+        Returns:
+            Pallet: The pallet type.
+        """
+        table = self.items
+        length, width = float(table.length[row]), float(table.width[row])
+        height, weight = float(table.height[row]), float(table.weight[row])
+        quantity = int(table.quantity[row])
+        cls = item_class(bool(table.bundled[row]), bool(table.assembled[row]))
+
+        best, best_key = None, None
+        pallets = self.catalog.pallets_of(cls)
+        for pallet in pallets:
+            if not fits_footprint(length, width, pallet):
+                continue
+            if pallet.max_height is not None and height > pallet.max_height:
+                continue
+            per_pallet = min(quantity, fits(capacity(pallet), volume), fits(pallet.max_weight or math.inf, weight))
+            if per_pallet == 0:
+                continue
+
+            key = (math.ceil(quantity / per_pallet) * pallet_cost(pallet), pallet is not default, pallet_cost(pallet))
+            if best_key is None or key < best_key:
+                best, best_key = pallet, key
+
+        if best is None:
+            return max(pallets, key=lambda p: (p.length * p.width, p.max_height is None, p.max_volume))
+        return best
+
+    def pack_group(self, pallet, rows, volumes):
+        """
+        Packs the lines of one pallet type, largest unit first. Units that do not fit the pallet footprint in either
+        orientation are packed one per pallet.
+
+        Args:
+            pallet (Pallet): The pallet type.
+            rows (list[int]): The lines, sorted by decreasing unit volume.
+            volumes (np.ndarray): The unit volume of every line.
+
+        Returns:
+            list[dict]: The pallets.
+        """
+        table = self.items
+        max_volume = capacity(pallet)
+        max_weight = pallet.max_weight or math.inf
+
+        results = []
+        current, volume_left, weight_left = None, 0.0, 0.0
+
+        for row in rows:
+            volume, weight = float(volumes[row]), float(table.weight[row])
+            quantity = int(table.quantity[row])
+
+            if not fits_footprint(float(table.length[row]), float(table.width[row]), pallet):
+                logger.warning('%s does not fit pallet %s, packing one per pallet', table.sku[row], pallet.type)
+                results.extend([self.new_pallet(pallet, row, 1)] * quantity)
+                continue
+
+            if current is not None:
+                count = min(quantity, fits(volume_left, volume), fits(weight_left, weight))
+                if count > 0:
+                    self.add_line(current, pallet, row, count)
+                    volume_left -= count * volume
+                    weight_left -= count * weight
+                    quantity -= count
+
+            if quantity == 0:
+                continue
+
+            per_pallet = max(1, min(quantity, fits(max_volume, volume), fits(max_weight, weight)))
+            full, rest = divmod(quantity, per_pallet)
+            if full > 0:
+                results.extend([self.new_pallet(pallet, row, per_pallet)] * full)
+
+            if rest > 0:
+                current = self.new_pallet(pallet, row, rest)
+                results.append(current)
+                volume_left = max_volume - rest * volume
+                weight_left = max_weight - rest * weight
+
+        return results
+
+    def new_pallet(self, pallet, row, count):
+        result = {
+            'type': pallet.type,
+            'size': pallet.size,
+            'length': pallet.length,
+            'width': pallet.width,
+            'height': PALLET_HEIGHT,
+            'actual_volume': 0,
+            'weight': round(pallet.weight, 1),
+            'assembled': pallet.assembled,
+            'items': [],
+        }
+        self.add_line(result, pallet, row, count)
+        return result
+
+    def add_line(self, result, pallet, row, count):
+        """
+        Places `count` units of a line on a pallet and updates its volume, weight and height.
+        """
+        table = self.items
+        line = {
+            'sku': table.sku[row],
+            'weight': float(table.weight[row]),
+            'length': float(table.length[row]),
+            'width': float(table.width[row]),
+            'height': float(table.height[row]),
+            'assembled': bool(table.assembled[row]),
+            'bundled': bool(table.bundled[row]),
+            'quantity': count,
+        }
+        volume = line['length'] * line['width'] * line['height'] * count
+
+        result['items'].append(line)
+        result['actual_volume'] = round(result['actual_volume'] + volume, 1)
+        result['weight'] = round(result['weight'] + line['weight'] * count, 1)
+        stack_height = round(result['actual_volume'] / (pallet.length * pallet.width), 1)
+        result['height'] = stack_height + PALLET_HEIGHT + MOCKUP_HEIGHT
+
+
+def fits_footprint(length, width, pallet):
+    """
+    Checks whether a unit fits the pallet footprint, turned 90 degrees or not.
+    """
+    return ((length <= pallet.length and width <= pallet.width) or
+            (width <= pallet.length and length <= pallet.width))
+
+
+def capacity(pallet):
+    """
+    Returns the volume a pallet can hold, within its maximum stacking height if it has one.
+    """
+    if pallet.max_height is None:
+        return pallet.max_volume
+    return min(pallet.max_volume, pallet.length * pallet.width * pallet.max_height)
+
+
+def fits(capacity_left, size):
+    """
+    Returns how many units of the given size fit in the remaining capacity.
+    """
+    if size <= 0:
+        return math.inf if capacity_left >= 0 else 0
+    if math.isinf(capacity_left):
+        return math.inf
+    return max(0, int(capacity_left // size))
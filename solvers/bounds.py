@@ -0,0 +1,160 @@
+import math
+from collections import Counter
+
+from solvers.palletsolver import compatible, pallet_cost, pallet_result
+
+# Tolerance when comparing objective values.
+EPSILON = 1e-6
+
+
+def item_volume(item):
+    return item.length * item.width * item.height
+
+
+def group_lower_bound(items, pallet_types):
+    """
+    Returns a lower bound on the number of pallets needed to hold a group of items.
+
+    The bound is the larger of a volume bound (total volume over the largest capacity) and a count bound
+    (number of items over the most items any pallet can hold given the smallest item volume).
+
+    Args:
+        items (list[Item]): The items of the group.
+        pallet_types (list[Pallet]): The pallet types the group may use.
+
+    Returns:
+        int: The minimum number of pallets.
+    """
+    if not items:
+        return 0
+
+    capacity = max(p.max_volume for p in pallet_types)
+    volumes = [item_volume(item) for item in items]
+    by_volume = math.ceil(sum(volumes) / capacity - EPSILON)
+
+    per_pallet = max(int(p.max_volume // min(volumes)) for p in pallet_types)
+    by_count = math.ceil(len(items) / per_pallet) if per_pallet > 0 else len(items)
+
+    return max(by_volume, by_count)
+
+
+def lower_bound(items, pallets):
+    """
+    Computes a lower bound on the objective of `PalletOptimizer` for the given items and candidate pallets.
+
+    Assembled items only share pallets with assembled items, so the bound is the sum of the bounds of the
+    assembled and non-assembled groups. Within the non-assembled group, bundled items need bundle pallets
+    of their own, and every other pallet costs at least the cheapest pallet of the group.
+
+    Args:
+        items (list[Item]): The items to be packed.
+        pallets (list[Pallet]): The candidate pallets.
+
+    Returns:
+        float: The lower bound, or None if some item fits no candidate pallet.
+    """
+    types = set(pallets)
+    bound = 0.0
+
+    for assembled in (True, False):
+        group = [item for item in items if item.assembled == assembled]
+        if not group:
+            continue
+
+        group_types = [p for p in types if p.assembled == assembled]
+        if any(not any(compatible(item, p) for p in group_types) for item in group):
+            return None
+
+        count = group_lower_bound(group, group_types)
+        cheapest = min(pallet_cost(p) for p in group_types)
+
+        bundled = [item for item in group if item.bundled]
+        bundle_types = [p for p in group_types if p.type == 'BD']
+        bundle_count = group_lower_bound(bundled, bundle_types) if bundled else 0
+        bundle_cost = min((pallet_cost(p) for p in bundle_types), default=cheapest)
+
+        bound += bundle_count * bundle_cost + max(0, count - bundle_count) * cheapest
+
+    return bound
+
+
+def first_fit_decreasing(items, pallets, key=pallet_cost):
+    """
+    Packs the items with the first-fit decreasing heuristic.
+
+    Items are placed largest first on the first open pallet they are compatible with and fit by volume.
+    When none does, a new pallet is opened from the remaining candidate pallets, preferring the lowest `key`.
+
+    Args:
+        items (list[Item]): The items to be packed.
+        pallets (list[Pallet]): The candidate pallets; each can be opened once.
+        key (callable): Ranks the candidate pallets when opening a new one.
+
+    Returns:
+        list[tuple[Pallet, list[int]]]: The used pallets with the indices of their items, or None if some
+        item could not be placed.
+    """
+    available = Counter(pallets)
+    ranked = sorted(available, key=lambda p: (key(p), -p.max_volume))
+    bins = []  # [pallet, remaining volume, item indices]
+
+    for i in sorted(range(len(items)), key=lambda i: -item_volume(items[i])):
+        item = items[i]
+        volume = item_volume(item)
+
+        for b in bins:
+            if b[1] >= volume and compatible(item, b[0]):
+                b[1] -= volume
+                b[2].append(i)
+                break
+        else:
+            pallet = next((p for p in ranked
+                           if available[p] > 0 and p.max_volume >= volume and compatible(item, p)), None)
+            if pallet is None:
+                return None
+            available[pallet] -= 1
+            bins.append([pallet, pallet.max_volume - volume, [i]])
+
+    return [(b[0], sorted(b[2])) for b in bins]
+
+
+def heuristic_solution(items, pallets):
+    """
+    Returns the best first-fit decreasing packing, opening either the cheapest or the largest pallets first.
+
+    Returns:
+        tuple[float, list[tuple[Pallet, list[int]]]]: The objective value and the packing, or (None, None).
+    """
+    best_cost, best = None, None
+    for key in (pallet_cost, lambda p: -p.max_volume):
+        packing = first_fit_decreasing(items, pallets, key)
+        if packing is None:
+            continue
+        cost = sum(pallet_cost(p) for p, _ in packing)
+        if best_cost is None or cost < best_cost - EPSILON:
+            best_cost, best = cost, packing
+
+    return best_cost, best
+
+
+def solve_if_trivial(items, pallets):
+    """
+    Solves the packing without the MILP when a heuristic solution provably matches the lower bound.
+
+    Args:
+        items (list[Item]): The items to be packed.
+        pallets (list[Pallet]): The candidate pallets.
+
+    Returns:
+        list[dict]: The pallets in the format of `PalletOptimizer.get_results`, or None if optimality
+        could not be proven.
+    """
+    bound = lower_bound(items, pallets)
+    if bound is None:
+        return None
+
+    cost, packing = heuristic_solution(items, pallets)
+    if cost is None or cost > bound + EPSILON:
+        return None
+
+    return [pallet_result(pallet, [items[i] for i in indices]) for pallet, indices in packing]
@@ -0,0 +1,104 @@
+from dataclasses import fields
+
+from solvers.bounds import EPSILON, item_volume
+from solvers.palletcatalog import item_class
+from solvers.palletsolver import Item, pallet_cost
+
+ITEM_FIELDS = tuple(f.name for f in fields(Item))
+
+
+def partition(items, pallets, chunk_size):
+    """
+    Splits a large order into chunks small enough for `PalletOptimizer`.
+
+    Units only share chunks with units of their item class. Within a class, units are ordered by candidate pallet
+    (largest first) and volume, so that each chunk holds units of similar size that pack well together.
+
+    Args:
+        items (list[Item]): The units of the order.
+        pallets (list[Pallet]): The candidate pallet of every unit.
+        chunk_size (int): Maximum number of units of a chunk.
+
+    Returns:
+        list[tuple[list[Item], list[Pallet]]]: The units of every chunk with their candidate pallets.
+    """
+    classes = {}
+    for item, pallet in zip(items, pallets):
+        classes.setdefault(item_class(item.bundled, item.assembled), []).append((item, pallet))
+
+    chunks = []
+    for units in classes.values():
+        units.sort(key=lambda unit: (-pallet_cost(unit[1]), -item_volume(unit[0])))
+        for start in range(0, len(units), chunk_size):
+            chunk = units[start:start + chunk_size]
+            chunks.append(([item for item, _ in chunk], [pallet for _, pallet in chunk]))
+
+    return chunks
+
+
+def pallet_key(pallet):
+    """
+    Returns what identifies a pallet spec in the results of `PalletOptimizer.get_results`.
+    """
+    if isinstance(pallet, dict):
+        return pallet['type'], pallet['size'], pallet['assembled']
+    return pallet.type, pallet.size, pallet.assembled
+
+
+def result_items(result):
+    """
+    Returns the items of a result of `PalletOptimizer.get_results` as `Item` objects.
+    """
+    return [Item(**{name: item[name] for name in ITEM_FIELDS}) for item in result['items']]
+
+
+def consolidate(results, pallets, solve, max_items, fill=0.8):
+    """
+    Merges under-filled pallets of the chunks.
+
+    The items of the pallets filled below `fill` of their volume, least filled first and up to `max_items` items, are
+    packed again by `solve` onto the same pallets, so that some of them can be left out. Assembled and other pallets are
+    consolidated separately. The new packing is kept only if it is cheaper.
+
+    Args:
+        results (list[dict]): The pallets of all chunks, in the format of `PalletOptimizer.get_results`.
+        pallets (list[Pallet]): The candidate pallets of the order, to look up the specs of the results.
+        solve (callable): Packs a list of items onto a list of candidate pallets, returning results.
+        max_items (int): Maximum number of items packed again at once.
+        fill (float): Fill ratio under which a pallet is under-filled.
+
+    Returns:
+        list[dict]: The consolidated pallets.
+    """
+    specs = {pallet_key(p): p for p in pallets}
+
+    def fill_ratio(result):
+        return result['actual_volume'] / specs[pallet_key(result)].max_volume
+
+    consolidated = []
+    for assembled in (True, False):
+        group = [r for r in results if specs[pallet_key(r)].assembled == assembled]
+        underfilled = sorted((r for r in group if fill_ratio(r) < fill), key=fill_ratio)
+
+        selected, count = [], 0
+        for result in underfilled:
+            if count + len(result['items']) > max_items:
+                break
+            selected.append(result)
+            count += len(result['items'])
+
+        kept = [r for r in group if not any(r is s for s in selected)]
+        consolidated.extend(kept)
+        if len(selected) < 2:
+            consolidated.extend(selected)
+            continue
+
+        items = [item for result in selected for item in result_items(result)]
+        candidates = [specs[pallet_key(r)] for r in selected]
+        merged = solve(items, candidates)
+
+        before = sum(pallet_cost(specs[pallet_key(r)]) for r in selected)
+        after = sum(pallet_cost(specs[pallet_key(r)]) for r in merged) if merged else None
+        consolidated.extend(merged if after is not None and after < before - EPSILON else selected)
+
+    return consolidated
@@ -1,12 +1,16 @@
+from solvers.itemtable import ItemTable
+from solvers.palletcatalog import BUNDLED, DEFAULT_CATALOG, RTA
+
+
 class EmpiricalSolver:
-    def __init__(self, items, pallet_length=48, pallet_width=40.5, pallet_height=48, pallet_max_weight=518):
+    def __init__(self, items, catalog=DEFAULT_CATALOG):
         """
         Initialize the EmpiricalSolver with a list of items and pallet constraints.
 
         Parameters:
         -----------
-        items : list
-            A list of dictionaries where each dictionary represents an item.
+        items : ItemTable or list
+            An `ItemTable`, or a list of dictionaries where each dictionary represents an item.
             Each item should have the following keys:
             - sku (str): The SKU of the item.
             - weight (float): The weight of the item.
@@ -16,20 +20,18 @@ class EmpiricalSolver:
             - bundled (bool): A flag indicating whether the item is bundled.
             - quantity (int): The quantity of the item.
 
-        pallet_length : float, optional
-            The length of the pallet (default is 48).
-
-        pallet_width : float, optional
-            The width of the pallet (default is 40.5).
-
-        pallet_max_weight : float, optional
-            The maximum weight the pallet can hold (default is 518 LB).
+        catalog : PalletCatalog, optional
+            The catalog the pallets are taken from (default is the default catalog). Items are
+            stacked on its smallest RTA pallet (PLT4: 48 x 40.5, 48 high, 518 LB) up to its
+            maximum weight, and every bundle gets its own bundle pallet.
         """
-        self.items = items
-        self.pallet_length = pallet_length
-        self.pallet_width = pallet_width
-        self.pallet_height = pallet_height
-        self.pallet_max_weight = pallet_max_weight
+        self.items = ItemTable.from_payload(items)
+        self.pallet = catalog.smallest(RTA)
+        self.bundle_pallet = catalog.smallest(BUNDLED)
+        self.pallet_length = self.pallet.length
+        self.pallet_width = self.pallet.width
+        self.pallet_height = self.pallet.max_height
+        self.pallet_max_weight = self.pallet.max_weight
 
     def solve(self):
         """
@@ -63,8 +65,8 @@ class EmpiricalSolver:
         # Append pallet
         for i in range(pallet_count):
             pallets.append({
-                'type': 'PLT4',
-                'size': 4,
+                'type': self.pallet.type,
+                'size': self.pallet.size,
                 'length': self.pallet_length,
                 'width': self.pallet_width,
                 'height': self.pallet_height,
@@ -77,8 +79,8 @@ class EmpiricalSolver:
         # The last pallet
         remaining_weight = round(total_cabinet_weight - self.pallet_max_weight * pallet_count, 1)
         pallets.append({
-            'type': 'PLT4',
-            'size': 4,
+            'type': self.pallet.type,
+            'size': self.pallet.size,
             'length': self.pallet_length,
             'width': self.pallet_width,
             'height': round(self.pallet_height * (remaining_weight/self.pallet_max_weight), 1),
@@ -89,22 +91,22 @@ class EmpiricalSolver:
         })
 
         # Handle bundle items
-        # Pallet(max_volume=9650, length=98, width=10, weight=3, type='BD', assembled=False, size=96)
-        bundle_volume = round(98 * 10 * 10)
-        for item in self.items:
-            if item['bundled']:
-                for _ in range(item['quantity']):
-                    pallets.append({
-                        'type': 'BD',
-                        'size': 96,
-                        'length': 98,
-                        'width': 10,
-                        'height': 10,
-                        'actual_volume': bundle_volume,
-                        'weight': item['weight'] + 3,
-                        'assembled': False,
-                        'items': []
-                    })
+        bundle = self.bundle_pallet
+        bundle_volume = round(bundle.length * bundle.width * bundle.max_height)
+        bundled = self.items.bundled
+        for weight, quantity in zip(self.items.weight[bundled].tolist(), self.items.quantity[bundled].tolist()):
+            for _ in range(quantity):
+                pallets.append({
+                    'type': bundle.type,
+                    'size': bundle.size,
+                    'length': bundle.length,
+                    'width': bundle.width,
+                    'height': bundle.max_height,
+                    'actual_volume': bundle_volume,
+                    'weight': weight + bundle.weight,
+                    'assembled': False,
+                    'items': []
+                })
 
         return pallets
 
@@ -118,8 +120,8 @@ def contains_assembled_items(items):
 
     Parameters:
     -----------
-    items : list
-        A list of dictionaries where each dictionary represents an item.
+    items : ItemTable or list
+        An `ItemTable`, or a list of dictionaries where each dictionary represents an item.
         Each item should have the following keys:
         - sku (str): The SKU of the item.
         - weight (float): The weight of the item.
@@ -135,6 +137,8 @@ def contains_assembled_items(items):
         True if there is at least one assembled item in the list, False otherwise.
 
     """
+    if isinstance(items, ItemTable):
+        return bool(items.assembled.any())
     return any(item.get('assembled', False) for item in items)
 
 
@@ -147,8 +151,8 @@ def total_weight_not_bundled(items):
 
     Parameters:
     -----------
-    items : list
-        A list of dictionaries where each dictionary represents an item.
+    items : ItemTable or list
+        An `ItemTable`, or a list of dictionaries where each dictionary represents an item.
         Each item should have the following keys:
         - sku (str): The SKU of the item.
         - weight (float): The weight of the item.
@@ -163,4 +167,6 @@ def total_weight_not_bundled(items):
     float
         The total weight of items that are not bundled.
     """
+    if isinstance(items, ItemTable):
+        return float(items.weight[~items.bundled] @ items.quantity[~items.bundled])
     return sum(item['weight'] * item['quantity'] for item in items if not item['bundled'])
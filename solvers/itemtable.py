@@ -0,0 +1,179 @@
+import hashlib
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+from solvers.palletsolver import Item
+
+NUMERIC_FIELDS = ('weight', 'length', 'width', 'height')
+FLAG_FIELDS = ('assembled', 'bundled')
+FIELDS = ('sku',) + NUMERIC_FIELDS + FLAG_FIELDS + ('quantity',)
+
+# Largest quantity accepted on an order line
+MAX_QUANTITY = 1_000_000
+
+
+@dataclass(eq=False)
+class ItemTable:
+    """
+    Columnar representation of an order: one array per item attribute, one row per order line.
+
+    This is the internal representation shared by the solvers. It can be built either from the
+    record format (a list of per-line dicts) or from the columnar format (a dict of parallel arrays),
+    and it is expanded into per-unit `Item` objects only when a solver needs them.
+
+    Attributes:
+        sku (np.ndarray): SKU of each line (object array of str).
+        weight (np.ndarray): Unit weight of each line.
+        length (np.ndarray): Unit length of each line.
+        width (np.ndarray): Unit width of each line.
+        height (np.ndarray): Unit height of each line.
+        assembled (np.ndarray): Boolean flags for assembled lines.
+        bundled (np.ndarray): Boolean flags for bundled lines.
+        quantity (np.ndarray): Number of units of each line.
+    """
+    sku: np.ndarray
+    weight: np.ndarray
+    length: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    assembled: np.ndarray
+    bundled: np.ndarray
+    quantity: np.ndarray
+
+    @classmethod
+    def from_payload(cls, payload):
+        """
+        Builds a table from a request payload in either format.
+
+        Args:
+            payload (list | dict): A list of per-line dicts, or a dict of parallel arrays keyed by field name.
+
+        Returns:
+            ItemTable: The validated table.
+
+        Raises:
+            ValueError: If the payload is malformed.
+        """
+        if isinstance(payload, cls):
+            return payload
+        if isinstance(payload, dict):
+            return cls.from_columns(payload)
+        if isinstance(payload, list):
+            return cls.from_records(payload)
+        raise ValueError('items must be a list of items or a dict of item columns')
+
+    @classmethod
+    def from_records(cls, items):
+        """
+        Builds a table from a list of per-line dicts.
+
+        Args:
+            items (list[dict]): Order lines with the keys listed in `FIELDS`.
+
+        Returns:
+            ItemTable: The validated table.
+        """
+        try:
+            columns = {field: [x[field] for x in items] for field in FIELDS if field not in FLAG_FIELDS}
+            for field in FLAG_FIELDS:
+                columns[field] = [x.get(field, False) for x in items]
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f'invalid item: missing {e}')
+
+        return cls.from_columns(columns)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Builds a table from parallel arrays, validating all columns at once.
+
+        The flag columns `assembled` and `bundled` may be omitted, in which case they default to False.
+        Flags must be booleans, and quantities whole numbers up to `MAX_QUANTITY`.
+
+        Args:
+            columns (dict): Field name to list (or array) of values, all of the same length.
+
+        Returns:
+            ItemTable: The validated table.
+
+        Raises:
+            ValueError: If a column is missing or not a list, the lengths differ, or values are out of range.
+        """
+        missing = [field for field in FIELDS if field not in FLAG_FIELDS and field not in columns]
+        if missing:
+            raise ValueError(f'missing item columns: {", ".join(missing)}')
+
+        not_lists = [field for field in FIELDS
+                     if field in columns and not isinstance(columns[field], (list, np.ndarray))]
+        if not_lists:
+            raise ValueError(f'item columns must be lists: {", ".join(not_lists)}')
+
+        try:
+            size = len(columns['sku'])
+            lengths = {field: len(columns[field]) for field in FIELDS if field in columns}
+        except TypeError:
+            raise ValueError('item columns must be lists')
+        if any(n != size for n in lengths.values()):
+            raise ValueError(f'item columns must have the same length: {lengths}')
+
+        try:
+            values = {field: np.asarray(columns[field], dtype=np.float64).reshape(size)
+                      for field in NUMERIC_FIELDS + ('quantity',)}
+        except (TypeError, ValueError):
+            raise ValueError('item columns must contain numbers and booleans only')
+
+        for field in FLAG_FIELDS:
+            column = np.asarray(columns.get(field, np.zeros(size, dtype=bool)))
+            if size and column.dtype != bool:
+                raise ValueError(f'{field} must contain booleans only')
+            values[field] = column.astype(bool).reshape(size)
+
+        for field in NUMERIC_FIELDS:
+            column = values[field]
+            bad = ~np.isfinite(column) | (column < 0)
+            if field != 'weight':
+                bad |= column == 0
+            if bad.any():
+                raise ValueError(f'invalid {field} at rows {np.flatnonzero(bad)[:10].tolist()}')
+
+        quantity = values['quantity']
+        bad = ~np.isfinite(quantity) | (quantity < 0) | (quantity > MAX_QUANTITY) | (quantity != np.floor(quantity))
+        if bad.any():
+            raise ValueError(f'invalid quantity at rows {np.flatnonzero(bad)[:10].tolist()}')
+        values['quantity'] = quantity.astype(np.int64)
+
+        sku = np.empty(size, dtype=object)
+        sku[:] = [str(x) for x in columns['sku']]
+
+        return cls(sku=sku, **values)
+
+    def __len__(self):
+        return len(self.sku)
+
+    @property
+    def total_quantity(self):
+        return int(self.quantity.sum())
+
+    def fingerprint(self):
+        """
+        Returns a digest of the order that does not depend on the order of its lines.
+
+        Returns:
+            str: Hex SHA-256 of the sorted lines.
+        """
+        lines = sorted(zip(*(getattr(self, field).tolist() for field in FIELDS)))
+        return hashlib.sha256(json.dumps(lines, separators=(',', ':')).encode()).hexdigest()
+
+    def expand(self):
+        """
+        Expands the table into one `Item` per unit, in line order.
+
+        Returns:
+            list[Item]: The units of the order.
+        """
+        quantity = self.quantity
+        columns = [np.repeat(getattr(self, field), quantity).tolist() for field in FIELDS[:-1]]
+
+        return [Item(*values) for values in zip(*columns)]
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+from solvers.palletsolver import Pallet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_NAME = 'default'
+
+# Item classes, in the order they take precedence: a bundled item is packed as a bundle even if it is assembled.
+BUNDLED = 'bundled'
+ASSEMBLED = 'assembled'
+RTA = 'rta'
+ITEM_CLASSES = (BUNDLED, ASSEMBLED, RTA)
+
+# One row per pallet spec. `max_item_length` is the upper bound (inclusive) of the item length bucket
+# served by the pallet within its item class; None means unbounded.
+DEFAULT_PALLETS = [
+    {'item_class': BUNDLED, 'max_item_length': None,
+     'type': 'BD', 'size': 96, 'max_volume': 9650, 'length': 98, 'width': 10, 'weight': 3,
+     'assembled': False, 'max_height': 10},
+    {'item_class': ASSEMBLED, 'max_item_length': 55,
+     'type': 'PLT5', 'size': 15, 'max_volume': 144738, 'length': 55, 'width': 48, 'weight': 68,
+     'assembled': True},
+    {'item_class': ASSEMBLED, 'max_item_length': None,
+     'type': 'PLT8', 'size': 18, 'max_volume': 131090, 'length': 102, 'width': 45.5, 'weight': 78,
+     'assembled': True},
+    {'item_class': RTA, 'max_item_length': 48,
+     'type': 'PLT4', 'size': 4, 'max_volume': 58372, 'length': 48, 'width': 40.5, 'weight': 35,
+     'assembled': False, 'max_height': 48, 'max_weight': 518},
+    {'item_class': RTA, 'max_item_length': 70,
+     'type': 'PLT6', 'size': 6, 'max_volume': 236275, 'length': 70, 'width': 45, 'weight': 70,
+     'assembled': False},
+    {'item_class': RTA, 'max_item_length': None,
+     'type': 'PLT8', 'size': 8, 'max_volume': 176256, 'length': 102, 'width': 45.5, 'weight': 78,
+     'assembled': False},
+]
+
+
+def item_class(bundled, assembled):
+    """
+    Returns the catalog item class of an item.
+    """
+    if bundled:
+        return BUNDLED
+    return ASSEMBLED if assembled else RTA
+
+
+class PalletCatalog:
+    """
+    An indexed table of pallet specs.
+
+    The specs of each item class are sorted by the upper bound of their item length bucket, so choosing the
+    pallet for an item is a binary search over the thresholds. Pallet specs are shared immutable objects.
+
+    Attributes:
+        name (str): Name of the catalog.
+        pallets (tuple[Pallet]): All pallet specs of the catalog.
+    """
+
+    def __init__(self, name, rows):
+        """
+        Builds the catalog from its rows.
+
+        Args:
+            name (str): Name of the catalog.
+            rows (list[dict]): Pallet specs with their `item_class` and `max_item_length` bucket bound.
+
+        Raises:
+            ValueError: If a row is malformed, an item class has no pallet, or the smallest RTA and bundle
+                pallets miss the height and weight limits the empirical solver relies on.
+        """
+        self.name = name
+        index = {c: [] for c in ITEM_CLASSES}
+
+        for row in rows:
+            row = dict(row)
+            try:
+                cls = row.pop('item_class')
+                bound = row.pop('max_item_length')
+                pallet = Pallet(**row)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f'invalid pallet in catalog {name}: {e}')
+            if cls not in index:
+                raise ValueError(f'invalid item class in catalog {name}: {cls}')
+            index[cls].append((float('inf') if bound is None else float(bound), pallet))
+
+        self._index = {}
+        for cls, entries in index.items():
+            if not entries:
+                raise ValueError(f'catalog {name} has no pallet for {cls} items')
+            entries.sort(key=lambda x: x[0])
+            self._index[cls] = (np.array([x[0] for x in entries]), tuple(x[1] for x in entries))
+
+        self.pallets = tuple(p for cls in ITEM_CLASSES for p in self._index[cls][1])
+
+        if self.smallest(RTA).max_height is None or self.smallest(RTA).max_weight is None:
+            raise ValueError(f'catalog {name}: the smallest {RTA} pallet needs max_height and max_weight')
+        if self.smallest(BUNDLED).max_height is None:
+            raise ValueError(f'catalog {name}: the smallest {BUNDLED} pallet needs max_height')
+
+    def pallet_for(self, bundled, assembled, length):
+        """
+        Returns the pallet an item packs onto.
+
+        Items longer than the largest bucket of their class go on the last pallet of the class.
+
+        Args:
+            bundled (bool): Whether the item is bundled.
+            assembled (bool): Whether the item is assembled.
+            length (float): Length of the item.
+
+        Returns:
+            Pallet: The shared pallet spec.
+        """
+        thresholds, pallets = self._index[item_class(bundled, assembled)]
+        return pallets[min(bisect_left(thresholds, length), len(pallets) - 1)]
+
+    def pallets_for(self, table):
+        """
+        Returns the pallet of every line of an item table.
+
+        Args:
+            table (ItemTable): The order lines.
+
+        Returns:
+            list[Pallet]: One shared pallet spec per line.
+        """
+        result = [None] * len(table)
+        classes = {
+            BUNDLED: table.bundled,
+            ASSEMBLED: ~table.bundled & table.assembled,
+            RTA: ~table.bundled & ~table.assembled,
+        }
+        for cls, mask in classes.items():
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                continue
+            thresholds, pallets = self._index[cls]
+            buckets = np.minimum(np.searchsorted(thresholds, table.length[rows], side='left'), len(pallets) - 1)
+            for row, bucket in zip(rows.tolist(), buckets.tolist()):
+                result[row] = pallets[bucket]
+
+        return result
+
+    def pallets_of(self, cls):
+        """
+        Returns the pallets of an item class, by increasing item length bucket.
+        """
+        return self._index[cls][1]
+
+    def smallest(self, cls):
+        """
+        Returns the pallet of the smallest length bucket of an item class.
+        """
+        return self._index[cls][1][0]
+
+
+def load_catalog(path):
+    """
+    Loads a catalog from a JSON file with the keys `name` (optional, defaults to the file name) and `pallets`.
+    """
+    with open(path) as f:
+        data = json.load(f)
+
+    name = data.get('name', os.path.splitext(os.path.basename(path))[0])
+    return PalletCatalog(name, data['pallets'])
+
+
+def load_catalogs():
+    """
+    Loads the default catalog and the per-tenant catalogs found in `PALLET_CATALOG_DIR`.
+    """
+    catalogs = {DEFAULT_CATALOG_NAME: PalletCatalog(DEFAULT_CATALOG_NAME, DEFAULT_PALLETS)}
+
+    directory = os.getenv('PALLET_CATALOG_DIR')
+    if directory and os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.json'):
+                catalog = load_catalog(os.path.join(directory, filename))
+                catalogs[catalog.name] = catalog
+                logger.info('Loaded pallet catalog %s', catalog.name)
+
+    return catalogs
+
+
+CATALOGS = load_catalogs()
+DEFAULT_CATALOG = CATALOGS[DEFAULT_CATALOG_NAME]
+
+
+def get_catalog(name=None):
+    """
+    Returns the catalog with the given name, or the default catalog if no name is given.
+
+    Raises:
+        ValueError: If there is no catalog with the given name.
+    """
+    if not name:
+        return DEFAULT_CATALOG
+    try:
+        return CATALOGS[name]
+    except KeyError:
+        raise ValueError(f'unknown pallet catalog: {name}')
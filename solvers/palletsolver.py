@@ -1,7 +1,10 @@
 import math
+from contextlib import nullcontext
 from dataclasses import dataclass
 from ortools.linear_solver import pywraplp
 
+PALLET_HEIGHT = 5.5  # height of the pallet deck
+
 
 @dataclass
 class Item:
@@ -26,11 +29,13 @@ class Item:
     bundled: bool
 
 
-@dataclass
+@dataclass(frozen=True)
 class Pallet:
     """
     Represents a pallet with its attributes for pallet optimization.
 
+    Pallets are immutable so that a single spec can be shared by every unit that packs onto it.
+
     Attributes:
         max_volume (float): Maximum volume capacity of the pallet.
         length (float): Length of the pallet.
@@ -39,6 +44,8 @@ class Pallet:
         type (str): Type of the pallet (e.g., 'BD', 'PLT4', 'PLT6', 'PLT8').
         assembled (bool): Indicates if the pallet is assembled.
         size (int): Size identifier for the pallet.
+        max_height (float): Maximum stack height of the pallet, or None if unbounded.
+        max_weight (float): Maximum load weight of the pallet, or None if unbounded.
     """
     max_volume: float
     length: float
@@ -47,6 +54,8 @@ class Pallet:
     type: str  # 'BD', 'PLT4', 'PLT6', 'PLT8'
     assembled: bool
     size: int
+    max_height: float = None
+    max_weight: float = None
 
 
 class PalletOptimizer:
@@ -59,17 +68,27 @@ class PalletOptimizer:
         solver (pywraplp.Solver): OR-Tools solver instance.
     """
 
-    def __init__(self, items, pallets):
+    def __init__(self, items, pallets, time_limit=None, tracer=None, warm_start=None):
         """
         Initializes the optimizer with items and pallets.
 
         Args:
             items (list[Item]): List of items to be packed.
             pallets (list[Pallet]): List of available pallets.
+            time_limit (int, optional): Time limit of the solver in milliseconds.
+            tracer (callable, optional): Called with the name of each solve phase; returns a context manager
+                that is entered for the duration of the phase.
+            warm_start (list[tuple[Pallet, list[int]]], optional): A feasible packing, as pallets with the
+                indices of their items, e.g. from `bounds.heuristic_solution`. It is the fallback incumbent
+                when the solver does not prove optimality within the time limit, see `solve`.
         """
         self.items = items
         self.pallets = pallets
+        self.tracer = tracer
+        self.warm_start = warm_start
         self.solver = pywraplp.Solver.CreateSolver('SCIP')
+        if time_limit:
+            self.solver.SetTimeLimit(int(time_limit))
 
     def create_variables(self):
         """
@@ -156,29 +175,56 @@ class PalletOptimizer:
         objective = self.solver.Objective()
 
         for j, pallet in enumerate(self.pallets):
-            penalty = pallet.size
-            objective.SetCoefficient(self.pallet_used_vars[j],
-                                     1 + penalty / 1000.0)  # Adjust the penalty scale as needed
+            objective.SetCoefficient(self.pallet_used_vars[j], pallet_cost(pallet))  # Adjust the penalty scale in pallet_cost
 
         objective.SetMinimization()
 
+    def warm_start_results(self):
+        """
+        Returns the warm start packing in the format of `get_results`.
+        """
+        return [pallet_result(pallet, [self.items[i] for i in indices]) for pallet, indices in self.warm_start]
+
     def solve(self):
         """
         Solves the optimization problem.
 
+        With a warm start, a solve that is not proven optimal within the time limit returns the
+        cheaper of the best solution found and the warm start, so it is never worse than the warm
+        start. The warm start is not given to SCIP as a hint: SCIP finds as good an incumbent at
+        the root on its own, and the hint changes its search so that some orders are no longer
+        proven optimal in time.
+
         Returns:
             dict: Results of the optimization including details of each pallet used, or a message indicating no optimal solution.
         """
-        self.create_variables()
-        self.add_constraints()
-        self.set_objective()
-        status = self.solver.Solve()
+        with self.phase('create_variables'):
+            self.create_variables()
+        with self.phase('add_constraints'):
+            self.add_constraints()
+        with self.phase('set_objective'):
+            self.set_objective()
+        with self.phase('solve'):
+            status = self.solver.Solve()
 
         if status == pywraplp.Solver.OPTIMAL:
-            return self.get_results()
-        else:
+            with self.phase('get_results'):
+                return self.get_results()
+        if not self.warm_start:
             return []  # no optimal solution found
 
+        with self.phase('get_results'):
+            warm_start_cost = sum(pallet_cost(pallet) for pallet, _ in self.warm_start)
+            if status == pywraplp.Solver.FEASIBLE and self.solver.Objective().Value() < warm_start_cost - 1e-6:
+                return self.get_results()
+            return self.warm_start_results()
+
+    def phase(self, name):
+        """
+        Returns the context manager that traces a solve phase.
+        """
+        return self.tracer(f'solver.{name}') if self.tracer else nullcontext()
+
     def get_results(self):
         """
         Retrieves the results of the optimization.
@@ -186,9 +232,6 @@ class PalletOptimizer:
         Returns:
             list[dict]: Details of each pallet used, including items and calculated height, or an empty list if no pallets are used.
         """
-        pallet_height = 5.5
-        mockup_height = 5  # minimum item height
-
         results = {
             'total_pallets_used': 0,
             'pallets': []
@@ -196,39 +239,84 @@ class PalletOptimizer:
 
         for j, pallet in enumerate(self.pallets):
             if self.pallet_used_vars[j].solution_value() > 0.5:
-                pallet_details = {
-                    'type': pallet.type,
-                    'size': pallet.size,
-                    'length': pallet.length,
-                    'width': pallet.width,
-                    'height': pallet_height,  # Initialize the height with height of the pallet
-                    'actual_volume': 0,
-                    'weight': round(pallet.weight, 1),  # Initialize the weight with weight of the pallet
-                    'assembled': False,
-                    'items': []
-                }
-
-                for i, item in enumerate(self.items):
-                    if self.item_pallet_vars[(i, j)].solution_value() > 0.5:
-                        item_details = {
-                            'sku': item.sku,
-                            'weight': item.weight,
-                            'length': item.length,
-                            'width': item.width,
-                            'height': item.height,
-                            'assembled': item.assembled,
-                            'bundled': item.bundled
-                        }
-                        pallet_details['items'].append(item_details)
-                        volume = item.length * item.width * item.height
-                        pallet_details['actual_volume'] += round(volume, 1)
-                        pallet_details['weight'] += round(item.weight, 1)
-                        pallet_details['assembled'] = item.assembled
-                if pallet_details['actual_volume'] > 0:
-                    pallet_details['height'] = round(pallet_details['actual_volume'] / (pallet.length * pallet.width),
-                                                     1) + pallet_height + mockup_height
+                items = [item for i, item in enumerate(self.items) if self.item_pallet_vars[(i, j)].solution_value() > 0.5]
 
                 results['total_pallets_used'] += 1
-                results['pallets'].append(pallet_details)
+                results['pallets'].append(pallet_result(pallet, items))
 
         return results['pallets']
+
+
+def pallet_cost(pallet):
+    """
+    Returns the objective cost of using a pallet: one per pallet plus a penalty proportional to its size.
+    """
+    return 1 + pallet.size / 1000.0
+
+
+def compatible(item, pallet):
+    """
+    Checks whether an item may be placed on a pallet, following the constraints of `PalletOptimizer`.
+
+    Args:
+        item (Item): The item.
+        pallet (Pallet): The pallet.
+
+    Returns:
+        bool: True if the item fits the pallet dimensions and its assembled/bundled class.
+    """
+    if item.length > pallet.length or item.width > pallet.width:
+        return False
+    if item.assembled != pallet.assembled:
+        return False
+    if item.bundled and (pallet.type != 'BD' or pallet.assembled):
+        return False
+    return not (pallet.type == 'BD' and item.assembled)
+
+
+def pallet_result(pallet, items):
+    """
+    Builds the result of one used pallet, in the format returned by `PalletOptimizer.get_results`.
+
+    Args:
+        pallet (Pallet): The pallet.
+        items (list[Item]): The items placed on the pallet.
+
+    Returns:
+        dict: Details of the pallet, including its items and calculated height.
+    """
+    pallet_height = PALLET_HEIGHT
+    mockup_height = 5  # minimum item height
+
+    pallet_details = {
+        'type': pallet.type,
+        'size': pallet.size,
+        'length': pallet.length,
+        'width': pallet.width,
+        'height': pallet_height,  # Initialize the height with height of the pallet
+        'actual_volume': 0,
+        'weight': round(pallet.weight, 1),  # Initialize the weight with weight of the pallet
+        'assembled': False,
+        'items': []
+    }
+
+    for item in items:
+        item_details = {
+            'sku': item.sku,
+            'weight': item.weight,
+            'length': item.length,
+            'width': item.width,
+            'height': item.height,
+            'assembled': item.assembled,
+            'bundled': item.bundled
+        }
+        pallet_details['items'].append(item_details)
+        volume = item.length * item.width * item.height
+        pallet_details['actual_volume'] += round(volume, 1)
+        pallet_details['weight'] += round(item.weight, 1)
+        pallet_details['assembled'] = item.assembled
+    if pallet_details['actual_volume'] > 0:
+        pallet_details['height'] = round(pallet_details['actual_volume'] / (pallet.length * pallet.width),
+                                         1) + pallet_height + mockup_height
+
+    return pallet_details
@@ -0,0 +1,265 @@
+import time
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import astuple
+
+from ortools.linear_solver import pywraplp
+
+from solvers.bounds import EPSILON, heuristic_solution, item_volume
+from solvers.palletsolver import compatible, pallet_cost, pallet_result
+
+# Maximum number of column generation rounds.
+MAX_ROUNDS = 200
+
+# Share of the time limit spent generating patterns; the rest is left to the integer master problem.
+PRICING_TIME_SHARE = 0.5
+
+
+class PatternSolver:
+    """
+    Packs items onto pallets by column generation over pallet loading patterns.
+
+    Identical items are grouped into item types with a demand. A pattern is a pallet type with a count of every item
+    type that fits the pallet by volume. The master problem chooses how many times to use each pattern so that every
+    demand is covered at the least cost, using each pallet type at most as often as it appears in the candidate
+    pallets. Patterns are generated by a knapsack pricing problem per pallet type on the duals of the LP relaxation,
+    and the integer master is then solved over the generated patterns.
+
+    The model grows with the number of distinct items and pallet types rather than with the number of units, and its
+    LP relaxation is much tighter than that of `PalletOptimizer`. It takes and returns the same arguments and results.
+
+    Attributes:
+        items (list[Item]): List of items to be packed.
+        pallets (list[Pallet]): List of available pallets.
+        lower_bound (float): Objective of the LP relaxation after column generation, a bound on the optimum.
+    """
+
+    def __init__(self, items, pallets, time_limit=None, tracer=None, warm_start=None):
+        """
+        Initializes the solver with items and pallets.
+
+        Args:
+            items (list[Item]): List of items to be packed.
+            pallets (list[Pallet]): List of available pallets.
+            time_limit (int, optional): Time limit of the solve in milliseconds.
+            tracer (callable, optional): Called with the name of each solve phase; returns a context manager
+                that is entered for the duration of the phase.
+            warm_start (list[tuple[Pallet, list[int]]], optional): A feasible packing, as pallets with the
+                indices of their items. Its patterns seed the master problem instead of those of the first-fit
+                decreasing packing.
+        """
+        self.items = items
+        self.pallets = pallets
+        self.time_limit = time_limit
+        self.tracer = tracer
+        self.warm_start = warm_start
+        self.lower_bound = None
+
+    def phase(self, name):
+        """
+        Returns the context manager that traces a solve phase.
+        """
+        return self.tracer(f'solver.{name}') if self.tracer else nullcontext()
+
+    def create_types(self):
+        """
+        Groups the items into item types and the pallets into pallet types.
+
+        - `item_types` holds the distinct items, `demand` their counts and `units` the indices of their items.
+          `type_of` maps the fields of an item to its item type.
+        - `pallet_types` holds the distinct pallets and `available` their counts.
+        """
+        units = {}
+        for i, item in enumerate(self.items):
+            units.setdefault(astuple(item), []).append(i)
+
+        self.type_of = {key: t for t, key in enumerate(units)}
+        self.units = list(units.values())
+        self.item_types = [self.items[indices[0]] for indices in self.units]
+        self.demand = [len(indices) for indices in self.units]
+
+        available = Counter(self.pallets)
+        self.pallet_types = list(available)
+        self.available = [available[pallet] for pallet in self.pallet_types]
+
+    def initial_patterns(self):
+        """
+        Returns the patterns of the warm start or of a first-fit decreasing packing, plus a pattern of as many units of
+        each item type as fit each compatible pallet type, so that the master problem starts feasible.
+
+        Returns:
+            list[tuple[int, tuple[int, ...]]]: Patterns as a pallet type and a count per item type.
+        """
+        pallet_index = {pallet: k for k, pallet in enumerate(self.pallet_types)}
+        patterns = set()
+
+        packing = self.warm_start
+        if packing is None:
+            _, packing = heuristic_solution(self.items, self.pallets)
+        for pallet, indices in packing or []:
+            counts = [0] * len(self.item_types)
+            for i in indices:
+                counts[self.type_of[astuple(self.items[i])]] += 1
+            patterns.add((pallet_index[pallet], tuple(counts)))
+
+        for k, pallet in enumerate(self.pallet_types):
+            for t, item in enumerate(self.item_types):
+                if compatible(item, pallet) and item_volume(item) <= pallet.max_volume + EPSILON:
+                    counts = [0] * len(self.item_types)
+                    counts[t] = min(self.demand[t], int(pallet.max_volume // max(item_volume(item), EPSILON)))
+                    patterns.add((k, tuple(counts)))
+
+        return list(patterns)
+
+    def solve_master(self, patterns, integer, time_limit=None):
+        """
+        Solves the master problem over the given patterns.
+
+        Args:
+            patterns (list[tuple[int, tuple[int, ...]]]): The patterns.
+            integer (bool): Solve the integer problem instead of its LP relaxation.
+            time_limit (int, optional): Time limit in milliseconds.
+
+        Returns:
+            tuple: The status, the objective value, the usage of every pattern, the duals of the demand constraints and
+            the duals of the pallet type constraints.
+        """
+        solver = pywraplp.Solver.CreateSolver('SCIP' if integer else 'GLOP')
+        if time_limit:
+            solver.SetTimeLimit(int(time_limit))
+
+        infinity = solver.infinity()
+        usage = [solver.IntVar(0, infinity, f'pattern_{p}') if integer else solver.NumVar(0, infinity, f'pattern_{p}')
+                 for p in range(len(patterns))]
+
+        covers = [solver.Constraint(self.demand[t], infinity) for t in range(len(self.item_types))]
+        limits = [solver.Constraint(0, self.available[k]) for k in range(len(self.pallet_types))]
+        objective = solver.Objective()
+        for p, (k, counts) in enumerate(patterns):
+            objective.SetCoefficient(usage[p], pallet_cost(self.pallet_types[k]))
+            limits[k].SetCoefficient(usage[p], 1)
+            for t, count in enumerate(counts):
+                if count:
+                    covers[t].SetCoefficient(usage[p], count)
+        objective.SetMinimization()
+
+        status = solver.Solve()
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            return status, None, None, None, None
+
+        values = [var.solution_value() for var in usage]
+        if integer:
+            return status, objective.Value(), values, None, None
+        return (status, objective.Value(), values,
+                [c.dual_value() for c in covers], [c.dual_value() for c in limits])
+
+    def price(self, k, duals, limit_dual):
+        """
+        Finds the pattern of a pallet type with the most negative reduced cost, by solving a bounded knapsack over
+        the item types weighted by the duals of their demand constraints.
+
+        Args:
+            k (int): The pallet type.
+            duals (list[float]): Duals of the demand constraints.
+            limit_dual (float): Dual of the constraint on the number of pallets of the type.
+
+        Returns:
+            tuple[int, ...]: The counts of the pattern, or None if no pattern has a negative reduced cost.
+        """
+        pallet = self.pallet_types[k]
+        candidates = [t for t, item in enumerate(self.item_types)
+                      if duals[t] > EPSILON and compatible(item, pallet) and item_volume(item) <= pallet.max_volume]
+        if not candidates:
+            return None
+
+        solver = pywraplp.Solver.CreateSolver('SCIP')
+        counts = {t: solver.IntVar(0, self.demand[t], f'count_{t}') for t in candidates}
+        solver.Add(sum(item_volume(self.item_types[t]) * counts[t] for t in candidates) <= pallet.max_volume)
+        solver.Maximize(sum(duals[t] * counts[t] for t in candidates))
+        if solver.Solve() != pywraplp.Solver.OPTIMAL:
+            return None
+
+        if pallet_cost(pallet) - limit_dual - solver.Objective().Value() > -EPSILON:
+            return None
+
+        pattern = [0] * len(self.item_types)
+        for t in candidates:
+            pattern[t] = int(round(counts[t].solution_value()))
+        return tuple(pattern)
+
+    def generate_patterns(self, patterns, deadline):
+        """
+        Adds patterns with a negative reduced cost until there is none left, the round limit is reached or the
+        deadline passes.
+
+        Returns:
+            list[tuple[int, tuple[int, ...]]]: The generated patterns.
+        """
+        known = set(patterns)
+        for _ in range(MAX_ROUNDS):
+            _, value, _, duals, limit_duals = self.solve_master(patterns, integer=False)
+            if value is None:
+                break
+            self.lower_bound = value
+
+            added = False
+            for k in range(len(self.pallet_types)):
+                pattern = self.price(k, duals, limit_duals[k])
+                if pattern is not None and (k, pattern) not in known:
+                    known.add((k, pattern))
+                    patterns.append((k, pattern))
+                    added = True
+
+            if not added or (deadline is not None and time.monotonic() > deadline):
+                break
+
+        return patterns
+
+    def solve(self):
+        """
+        Solves the packing problem.
+
+        Returns:
+            list[dict]: Details of each pallet used, in the format of `PalletOptimizer.get_results`, or an empty list
+            if no solution was found.
+        """
+        started = time.monotonic()
+        deadline = started + self.time_limit / 1000 if self.time_limit else None
+        pricing_deadline = started + self.time_limit / 1000 * PRICING_TIME_SHARE if self.time_limit else None
+
+        with self.phase('create_variables'):
+            self.create_types()
+            patterns = self.initial_patterns()
+        with self.phase('generate_patterns'):
+            patterns = self.generate_patterns(patterns, pricing_deadline)
+        with self.phase('solve'):
+            remaining = None if deadline is None else max(1, int((deadline - time.monotonic()) * 1000))
+            _, _, usage, _, _ = self.solve_master(patterns, integer=True, time_limit=remaining)
+
+        if usage is None:
+            return []  # no solution found
+
+        with self.phase('get_results'):
+            return self.get_results(patterns, usage)
+
+    def get_results(self, patterns, usage):
+        """
+        Assigns the units of every item type to the chosen patterns. Patterns may cover more units than the demand,
+        so pallets that end up empty are left out.
+
+        Returns:
+            list[dict]: Details of each pallet used, including items and calculated height.
+        """
+        remaining = [list(indices) for indices in self.units]
+        results = []
+
+        for (k, counts), used in zip(patterns, usage):
+            for _ in range(int(round(used))):
+                items = []
+                for t, count in enumerate(counts):
+                    take, remaining[t] = remaining[t][:count], remaining[t][count:]
+                    items.extend(self.items[i] for i in take)
+                if items:
+                    results.append(pallet_result(self.pallet_types[k], items))
+
+        return results
@@ -0,0 +1,270 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from solvers.palletsolver import PALLET_HEIGHT
+
+# Units of mixed pallets packed geometrically per call of `apply_line_heights`, about half a second of work.
+MAX_LINE_UNITS = 1000
+
+
+@dataclass
+class Placement:
+    """
+    Represents the position of a box on a pallet.
+
+    Attributes:
+        index (int): Index of the box in the packed list.
+        x (float): Offset of the box along the pallet length.
+        y (float): Offset of the box along the pallet width.
+        z (float): Height of the bottom of the box above the pallet deck.
+        length (float): Extent of the box along the pallet length.
+        width (float): Extent of the box along the pallet width.
+        height (float): Height of the box.
+        rotated (bool): Indicates if the box is turned 90 degrees, i.e. its length runs along the pallet width.
+    """
+    index: int
+    x: float
+    y: float
+    z: float
+    length: float
+    width: float
+    height: float
+    rotated: bool
+
+
+class SkylinePacker:
+    """
+    Packs boxes on a pallet footprint using a heightmap.
+
+    The footprint is discretized into square cells of `resolution` inches and the heightmap holds the top of the
+    stack over every cell. Boxes are placed tallest and largest first, each at the lowest position its footprint
+    fits (then the one closest to the pallet corner), which builds the load in layers of similar heights. Boxes
+    stay upright and may be turned 90 degrees; when both orientations are equally low, `prefer_rotated` decides.
+    Sizes are rounded up to whole cells. Each placement costs a fixed number of operations for a given pallet, so
+    packing is linear in the number of boxes.
+
+    Attributes:
+        length (float): Length of the pallet.
+        width (float): Width of the pallet.
+        max_height (float): Maximum stack height, or None if unbounded.
+        resolution (float): Size of a heightmap cell.
+        rotate (bool): Indicates if boxes may be turned 90 degrees.
+        prefer_rotated (bool): Indicates if turned boxes are preferred over equally low boxes that are not.
+    """
+
+    def __init__(self, length, width, max_height=None, resolution=1.0, rotate=True, prefer_rotated=False):
+        self.length = length
+        self.width = width
+        self.max_height = max_height
+        self.resolution = resolution
+        self.rotate = rotate
+        self.prefer_rotated = prefer_rotated
+        self.heightmap = np.zeros((self._cells(length), self._cells(width)))
+
+    def _cells(self, size):
+        # Partial cells count as whole ones, so any box that is not larger than the pallet fits its footprint
+        return math.ceil(size / self.resolution - 1e-9)
+
+    @property
+    def stack_height(self):
+        """
+        Returns the height of the load above the pallet deck.
+        """
+        return float(self.heightmap.max()) if self.heightmap.size else 0.0
+
+    def place(self, length, width, height):
+        """
+        Finds the lowest position of a box and places it there.
+
+        Args:
+            length (float): Length of the box.
+            width (float): Width of the box.
+            height (float): Height of the box.
+
+        Returns:
+            tuple[int, int, float, bool]: Cell offsets, bottom height and rotation of the box, or None if it fits
+            nowhere.
+        """
+        best = None
+        orientations = [(length, width, False)]
+        if self.rotate and length != width:
+            orientations.append((width, length, True))
+
+        for box_length, box_width, rotated in orientations:
+            a, b = self._cells(box_length), self._cells(box_width)
+            nx, ny = self.heightmap.shape
+            if a > nx or b > ny:
+                continue
+
+            # Maximum of the heightmap under every footprint position, one axis at a time
+            rows = sliding_window_view(self.heightmap, a, axis=0).max(axis=-1)
+            support = sliding_window_view(rows, b, axis=1).max(axis=-1)
+            position = np.unravel_index(np.argmin(support), support.shape)
+            z = float(support[position])
+            if self.max_height is not None and z + height > self.max_height + 1e-9:
+                continue
+
+            candidate = (z, rotated != self.prefer_rotated, int(position[0]), int(position[1]), rotated, a, b)
+            if best is None or candidate[:4] < best[:4]:
+                best = candidate
+
+        if best is None:
+            return None
+
+        z, _, x, y, rotated, a, b = best
+        self.heightmap[x:x + a, y:y + b] = z + height
+
+        return x, y, z, rotated
+
+    def pack(self, boxes):
+        """
+        Packs boxes on the pallet.
+
+        Args:
+            boxes (list[tuple[float, float, float]]): Length, width and height of each box.
+
+        Returns:
+            tuple[list[Placement], list[int]]: The placements, in the order of `boxes`, and the indices of the boxes
+            that could not be placed.
+        """
+        order = sorted(range(len(boxes)), key=lambda i: (-boxes[i][2], -boxes[i][0] * boxes[i][1]))
+        placements = {}
+        unplaced = []
+
+        for i in order:
+            length, width, height = boxes[i]
+            position = self.place(length, width, height)
+            if position is None:
+                unplaced.append(i)
+                continue
+
+            x, y, z, rotated = position
+            placements[i] = Placement(index=i, x=x * self.resolution, y=y * self.resolution, z=round(z, 1),
+                                      length=width if rotated else length, width=length if rotated else width,
+                                      height=height, rotated=rotated)
+
+        return [placements[i] for i in sorted(placements)], sorted(unplaced)
+
+
+def pack_pallet(length, width, items, max_height=None, resolution=1.0):
+    """
+    Packs items on a pallet footprint, keeping the lower of the packings that prefer either orientation.
+
+    Args:
+        length (float): Length of the pallet.
+        width (float): Width of the pallet.
+        items (list): Items with `length`, `width` and `height`, either as `Item` objects or as dicts.
+        max_height (float, optional): Maximum stack height.
+        resolution (float, optional): Size of a heightmap cell (default is 1 inch).
+
+    Returns:
+        tuple[float, list[Placement], list[int]]: The stack height, the placements and the unplaced item indices.
+    """
+    boxes = [(x['length'], x['width'], x['height']) if isinstance(x, dict) else (x.length, x.width, x.height)
+             for x in items]
+    best = None
+    for prefer_rotated in (False, True):
+        packer = SkylinePacker(length, width, max_height=max_height, resolution=resolution,
+                               prefer_rotated=prefer_rotated)
+        placements, unplaced = packer.pack(boxes)
+        result = (packer.stack_height, placements, unplaced)
+        if best is None or (len(unplaced), result[0]) < (len(best[2]), best[0]):
+            best = result
+
+    return best
+
+
+def apply_heights(pallets, resolution=1.0):
+    """
+    Replaces the estimated heights of packed pallets with the heights of a geometric packing.
+
+    This is a post-pass on the output of `PalletOptimizer.get_results`: every pallet height becomes the pallet deck
+    height plus the height of its stack, and every item gets its `position` on the pallet. Pallets whose items cannot
+    all be placed keep their estimated height.
+
+    Args:
+        pallets (list[dict]): The pallets, in the format returned by `PalletOptimizer.get_results`.
+        resolution (float, optional): Size of a heightmap cell (default is 1 inch).
+
+    Returns:
+        list[dict]: The same pallets, updated in place.
+    """
+    for pallet in pallets:
+        if not pallet['items']:
+            continue
+
+        stack_height, placements, unplaced = pack_pallet(pallet['length'], pallet['width'], pallet['items'],
+                                                         resolution=resolution)
+        if unplaced:
+            continue
+
+        pallet['height'] = round(stack_height + PALLET_HEIGHT, 1)
+        for placement in placements:
+            pallet['items'][placement.index]['position'] = {
+                'x': placement.x,
+                'y': placement.y,
+                'z': placement.z,
+                'rotated': placement.rotated,
+            }
+
+    return pallets
+
+
+def layer_height(length, width, item, count, resolution=1.0):
+    """
+    Returns the stack height of `count` identical items packed in layers of the best grid of either orientation, or
+    None if the item does not fit the footprint. Sizes are rounded up to whole cells, as in `SkylinePacker`.
+    """
+    cells_length, cells_width = int(length // resolution), int(width // resolution)
+    item_length, item_width = math.ceil(item['length'] / resolution), math.ceil(item['width'] / resolution)
+    per_layer = max((cells_length // item_length) * (cells_width // item_width),
+                    (cells_length // item_width) * (cells_width // item_length))
+    if per_layer == 0:
+        return None
+    return math.ceil(count / per_layer) * item['height']
+
+
+def apply_line_heights(pallets, resolution=1.0, max_units=MAX_LINE_UNITS):
+    """
+    Replaces the estimated heights of pallets whose items are order lines with a `quantity`, as returned by
+    `AggregateSolver`, with the heights of a geometric packing.
+
+    Repeated pallets are computed once. A pallet of a single line is stacked in layers of the best grid of its unit.
+    Mixed pallets are packed with `pack_pallet`, unit by unit, as long as the units packed so far stay within
+    `max_units`; the others, and pallets whose units cannot all be placed, keep their estimated height. Items get no
+    `position`, since a line stands for several units.
+
+    Args:
+        pallets (list[dict]): The pallets, in the format returned by `AggregateSolver.solve`.
+        resolution (float, optional): Size of a heightmap cell (default is 1 inch).
+        max_units (int, optional): Maximum number of units of mixed pallets packed geometrically.
+
+    Returns:
+        list[dict]: The same pallets, updated in place.
+    """
+    seen = set()
+    budget = max_units
+    for pallet in pallets:
+        if id(pallet) in seen or not pallet['items']:
+            continue
+        seen.add(id(pallet))
+
+        lines = pallet['items']
+        if len(lines) == 1:
+            stack_height = layer_height(pallet['length'], pallet['width'], lines[0], lines[0]['quantity'], resolution)
+        else:
+            units = [line for line in lines for _ in range(line['quantity'])]
+            if len(units) > budget:
+                continue
+            budget -= len(units)
+            stack_height, _, unplaced = pack_pallet(pallet['length'], pallet['width'], units, resolution=resolution)
+            if unplaced:
+                stack_height = None
+
+        if stack_height is not None:
+            pallet['height'] = round(stack_height + PALLET_HEIGHT, 1)
+
+    return pallets
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from solvers.itemtable import MAX_QUANTITY, ItemTable
+
+
+def columns(**overrides):
+    values = {
+        'sku': ['A', 'B', 'C'],
+        'weight': [10, 12, 20],
+        'length': [10, 12, 20],
+        'width': [10, 12, 20],
+        'height': [10, 12, 20],
+        'assembled': [False, True, False],
+        'bundled': [False, False, False],
+        'quantity': [1, 2, 3],
+    }
+    values.update(overrides)
+    return values
+
+
+def test_from_columns():
+    table = ItemTable.from_payload(columns())
+    assert len(table) == 3
+    assert table.total_quantity == 6
+    assert table.assembled.tolist() == [False, True, False]
+
+
+def test_flags_default_to_false():
+    payload = columns()
+    del payload['assembled'], payload['bundled']
+    table = ItemTable.from_payload(payload)
+    assert not table.assembled.any() and not table.bundled.any()
+
+
+def test_records_match_columns():
+    records = [{'sku': 'A', 'weight': 1, 'length': 2, 'width': 3, 'height': 4, 'quantity': 5, 'bundled': True}]
+    table = ItemTable.from_payload(records)
+    assert table.bundled.tolist() == [True]
+    assert table.assembled.tolist() == [False]
+
+
+@pytest.mark.parametrize('flags', [['false', 'false', 'false'], [0, 1, 0], [None, None, None]])
+def test_rejects_flags_that_are_not_booleans(flags):
+    with pytest.raises(ValueError, match='bundled'):
+        ItemTable.from_payload(columns(bundled=flags))
+
+
+def test_rejects_string_flag_in_records():
+    records = [{'sku': 'A', 'weight': 1, 'length': 2, 'width': 3, 'height': 4, 'quantity': 1, 'bundled': 'false'}]
+    with pytest.raises(ValueError):
+        ItemTable.from_payload(records)
+
+
+@pytest.mark.parametrize('field, value', [('sku', 'abc'), ('weight', 5), ('quantity', {'a': 1}),
+                                          ('assembled', True), ('height', np.float64(5))])
+def test_rejects_columns_that_are_not_lists(field, value):
+    with pytest.raises(ValueError, match='lists'):
+        ItemTable.from_payload(columns(**{field: value}))
+
+
+def test_rejects_scalar_array_column():
+    with pytest.raises(ValueError, match='lists'):
+        ItemTable.from_payload(columns(sku=np.asarray('abc')))
+
+
+@pytest.mark.parametrize('quantity', [1e20, MAX_QUANTITY + 1, -1, 1.5, float('nan')])
+def test_rejects_invalid_quantity(quantity):
+    with pytest.raises(ValueError, match='quantity'):
+        ItemTable.from_payload(columns(quantity=[1, 1, quantity]))
+
+
+def test_rejects_columns_of_different_lengths():
+    with pytest.raises(ValueError, match='same length'):
+        ItemTable.from_payload(columns(weight=[1, 2]))
@@ -0,0 +1,21 @@
+import socket
+
+
+def client_disconnected(environ):
+    """
+    Check whether the client of a request has closed its connection.
+    Only supported when served by gunicorn, which exposes the client socket in the WSGI environ.
+    :param environ: WSGI environ of the request.
+    :return: True if the client is gone, False if it is connected or the server does not tell.
+    """
+    sock = environ.get('gunicorn.socket')
+    if sock is None:
+        return False
+
+    try:
+        # An orderly shutdown by the client reads as end of stream
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import queue
+import random
+import reprlib
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+
+class CapFilter(logging.Filter):
+    """
+    Caps the size of what is formatted for records below WARNING.
+    Containers in the arguments are abbreviated with reprlib before the message is formatted, and the message is
+    truncated to `max_chars`, so logging a large payload costs a bounded amount of work. Records at WARNING and above,
+    and exception tracebacks (appended when the record is formatted), are never truncated.
+    """
+
+    def __init__(self, max_chars=2000):
+        super().__init__()
+        self.max_chars = max_chars
+        self._repr = reprlib.Repr()
+        self._repr.maxlevel = 3
+        self._repr.maxlist = self._repr.maxtuple = self._repr.maxset = self._repr.maxdict = 10
+        self._repr.maxstring = self._repr.maxother = max_chars
+
+    def cap(self, arg):
+        if isinstance(arg, str):
+            return arg if len(arg) <= self.max_chars else self.truncate(arg)
+        if isinstance(arg, (list, tuple, dict, set, frozenset)):
+            return self._repr.repr(arg)
+        return arg
+
+    def truncate(self, text):
+        return f'{text[:self.max_chars]}... [{len(text) - self.max_chars} chars truncated]'
+
+    def filter(self, record):
+        # A record reaches the filter of every handler; it is capped only once
+        if record.levelno >= logging.WARNING or getattr(record, 'capped', False):
+            return True
+
+        if isinstance(record.args, tuple):
+            record.args = tuple(self.cap(arg) for arg in record.args)
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg, record.args = self.truncate(message), None
+        record.capped = True
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of the records below WARNING for the configured loggers.
+    Rates apply to a logger and its children; the most specific configured logger wins.
+    Example usage:
+        SamplingFilter({'api.routes': 0.01, 'solvers': 0.1})
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+def parse_sample_rates(value):
+    """
+    Parse sampling rates given as `logger=rate` pairs separated by commas, e.g. `api.routes=0.01,solvers=0.1`.
+    :param value:
+    :return: Logger name to rate.
+    """
+    rates = {}
+    for pair in filter(None, (x.strip() for x in (value or '').split(','))):
+        name, _, rate = pair.partition('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def configure(level, max_chars=2000, sample_rates=None, asynchronous=True):
+    """
+    Configure the root logger to write to its existing handlers (e.g. the Lambda runtime's), or to stderr if it has none.
+    With `asynchronous`, records are handed to a queue in the calling thread and written by a background thread.
+    Either way, messages below WARNING are capped to `max_chars`.
+    :param level: Log level of the root logger.
+    :param max_chars: Maximum length of a logged message below WARNING.
+    :param sample_rates: Logger name to share of records below WARNING to keep.
+    :param asynchronous: Write records from a background thread.
+    :return: The queue listener, or None if logging is synchronous.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    handlers = list(root.handlers)
+    if not handlers:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [stream_handler]
+
+    listener = None
+    if asynchronous:
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers)
+        listener.start()
+        atexit.register(listener.stop)
+        handlers = [QueueHandler(log_queue)]
+
+    for handler in handlers:
+        if sample_rates:
+            handler.addFilter(SamplingFilter(sample_rates))
+        handler.addFilter(CapFilter(max_chars))
+        if handler not in root.handlers:
+            root.addHandler(handler)
+
+    return listener
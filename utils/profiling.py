@@ -0,0 +1,125 @@
+import contextvars
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+_active = contextvars.ContextVar('profiling_active', default=False)
+
+# cProfile can only profile one request at a time on recent Pythons
+_lock = threading.Lock()
+
+
+def is_active():
+    """
+    Tell whether the current request is being profiled.
+    Code that would move work out of the request (to another process or another request) should keep it in-process
+    while profiling, so that the profile covers it.
+    :return: True if a profiler is running for the current request.
+    """
+    return _active.get()
+
+
+def get_profile_dir():
+    """
+    Get the directory profiles are written to from environment variables.
+    :return:
+    """
+    return os.getenv('PROFILE_DIR', '/tmp/profiles')
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and counts the collapsed stacks.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def write_collapsed(self, path):
+        """
+        Write the stacks in the collapsed format read by flame graph tools, one `stack count` per line.
+        :param path:
+        :return:
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """
+    Profile the current thread with cProfile and a stack sampler, then write `<name>.pstats` and `<name>.collapsed`
+    to the profile directory.
+    Example usage:
+        with Profiler('pack') as profiler:
+            pack()
+        print(profiler.name)
+    """
+
+    def __init__(self, label, directory=None):
+        self.label = label
+        self.directory = directory or get_profile_dir()
+        self.name = None
+        self.started = False
+
+    def __enter__(self):
+        if not _lock.acquire(blocking=False):
+            logger.warning('Another request is being profiled, not profiling %s', self.label)
+            return self
+
+        self.started = True
+        self.name = f'{time.strftime("%Y%m%d-%H%M%S")}-{self.label}-{os.getpid()}-{threading.get_ident()}'
+        self._token = _active.set(True)
+        self._sampler = StackSampler(threading.get_ident())
+        self._profile = cProfile.Profile()
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.started:
+            return False
+
+        try:
+            self._profile.disable()
+            self._sampler.stop()
+            _active.reset(self._token)
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self.name)
+            self._profile.dump_stats(f'{path}.pstats')
+            self._sampler.write_collapsed(f'{path}.collapsed')
+            logger.info('Wrote profile %s', path)
+        finally:
+            _lock.release()
+
+        return False
@@ -5,6 +5,8 @@ import os
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
 
+from utils import tracing
+
 logger = logging.getLogger(__name__)
 
 
@@ -124,6 +126,7 @@ def get_local_credentials():
 
 
 # Function to retrieve credentials from secret manager or from environment variables depending on app environment.
+@tracing.traced('secret.get_credentials')
 def get_credentials():
     """
     Retrieve tokens from secret manager or from environment variables depending on app environment.
@@ -176,8 +179,14 @@ def store_credentials(secret_value):
 
 
 def create_boto_client(service_name: str):
+    """
+    Create a client of an AWS service. `SECRETS_MANAGER_ENDPOINT_URL` overrides the endpoint, e.g. for a local stand-in.
+    :param service_name:
+    :return:
+    """
     return boto3.client(
         service_name,
         aws_access_key_id=os.getenv('SECRETS_MANAGER_AWS_ACCESS_KEY_ID'),
         aws_secret_access_key=os.getenv('SECRETS_MANAGER_AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('SECRETS_MANAGER_AWS_REGION'))
+        region_name=os.getenv('SECRETS_MANAGER_AWS_REGION'),
+        endpoint_url=os.getenv('SECRETS_MANAGER_ENDPOINT_URL'))
@@ -0,0 +1,250 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'smart-packing'
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+AMZN_TRACE_ROOT = re.compile(r'Root=1-([0-9a-f]{8})-([0-9a-f]{24})')
+
+
+def get_exporter_name():
+    """
+    Get the span exporter from environment variables: 'none' (default), 'file' or 'otlp'.
+    :return:
+    """
+    return os.getenv('TRACE_EXPORTER', 'none').lower()
+
+
+def is_enabled():
+    return get_exporter_name() != 'none'
+
+
+class Span:
+    """
+    A timed operation of a trace.
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'duration_ms': round((self.end - self.start) / 1e6, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': [{'key': k, 'value': {'stringValue': str(v)}} for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class Exporter:
+    """
+    Export finished spans from a background thread, in batches, so that requests never wait on the export.
+    Spans are dropped when the buffer is full.
+    """
+
+    def __init__(self, export, max_queue=10000, batch_size=256, interval=1.0):
+        self.export = export
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def submit(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception as e:
+                logger.warning('Failed to export %d spans: %s', len(batch), e)
+
+
+def export_to_file(spans):
+    """
+    Append spans as JSON lines to the file named by `TRACE_FILE` (default /tmp/traces.jsonl).
+    :param spans:
+    :return:
+    """
+    with open(os.getenv('TRACE_FILE', '/tmp/traces.jsonl'), 'a') as f:
+        for span in spans:
+            f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+def export_to_otlp(spans):
+    """
+    Post spans in the OTLP/HTTP JSON format to the collector at `TRACE_OTLP_ENDPOINT`
+    (default http://localhost:4318/v1/traces).
+    :param spans:
+    :return:
+    """
+    endpoint = os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    body = {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': [span.to_otlp() for span in spans]}],
+        }]
+    }
+    requests.post(endpoint, json=body, timeout=5).raise_for_status()
+
+
+_exporter = None
+_exporter_pid = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """
+    Get the span exporter of this process, starting it on first use.
+    :return: The exporter, or None if tracing is disabled.
+    """
+    global _exporter, _exporter_pid
+
+    name = get_exporter_name()
+    if name == 'none':
+        return None
+
+    with _exporter_lock:
+        if _exporter is None or _exporter_pid != os.getpid():
+            _exporter = Exporter(export_to_otlp if name == 'otlp' else export_to_file)
+            _exporter_pid = os.getpid()
+
+    return _exporter
+
+
+def parse_trace_headers(headers):
+    """
+    Extract the incoming trace id and parent span id from W3C `traceparent` or AWS `X-Amzn-Trace-Id` headers.
+    :param headers: Request headers.
+    :return: (trace_id, parent_id), either of which may be None.
+    """
+    match = TRACEPARENT.match(headers.get('traceparent', '').strip().lower())
+    if match:
+        return match.group(1), match.group(2)
+
+    match = AMZN_TRACE_ROOT.search(headers.get('X-Amzn-Trace-Id', '').lower())
+    if match:
+        return match.group(1) + match.group(2), None
+
+    return None, None
+
+
+def current_span():
+    return _current.get()
+
+
+def current_context():
+    """
+    Get the context to continue the current trace in another process.
+    :return: (trace_id, span_id) of the current span, or None.
+    """
+    span = _current.get()
+    return (span.trace_id, span.span_id) if span else None
+
+
+@contextmanager
+def span(name, trace_id=None, parent_id=None, **attributes):
+    """
+    Time a block as a span of the current trace, or of a new trace if there is none.
+    Example usage:
+        with tracing.span('freight.pack', units=10) as s:
+            s.set_attribute('pallets', 2)
+    :param name: Name of the span.
+    :param trace_id: Trace to continue instead of the current one.
+    :param parent_id: Parent span of `trace_id`.
+    :param attributes: Attributes of the span.
+    :return:
+    """
+    exporter = get_exporter()
+    if exporter is None:
+        yield None
+        return
+
+    parent = _current.get()
+    if trace_id is None and parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+
+    current = Span(name, trace_id or secrets.token_hex(16), parent_id, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        current.end = time.time_ns()
+        _current.reset(token)
+        exporter.submit(current)
+
+
+def traced(name):
+    """
+    Decorate a function so that every call is a span.
+    :param name: Name of the span.
+    :return:
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator